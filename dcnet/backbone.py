@@ -5,24 +5,52 @@ import sys
 import networkx as nx
 import math
 import pandas
+import re
 
 from collections import Counter
-from glob import glob
 
+from dcnet.util import benchmarkCodecs
 from dcnet.util import calc_homogeneity
 from dcnet.util import dumpJsonToFile
 from dcnet.util import genericErrorInfo
 from dcnet.util import get_mov_imdb_id
 from dcnet.util import getDictFromFile
-from dcnet.util import getDictFromJsonGZ
-from dcnet.util import gzipTextFile
+from dcnet.util import iterParallelTask
+
+from dcnet.bootstrap import add_bootstrap_homogeneity
 
 from dcnet.imdb_scraper import get_full_credits_for_director
 from dcnet.imdb_scraper import get_full_crew_for_movie
 from dcnet.imdb_scraper import is_feature_film
 from dcnet.imdb_scraper import is_feature_film_v2
 
-from NwalaTextUtils.textutils import parallelTask
+from dcnet.journal import ScrapeJournal
+from dcnet.negative_cache import NegativeCache
+from dcnet.negative_cache import parse_retry_after
+
+from dcnet.shard import in_shard
+from dcnet.shard import parse_shard
+
+from dcnet.result_cache import get_director_manifest
+from dcnet.result_cache import RESULT_CACHE_DIRNAME
+from dcnet.result_cache import ResultCache
+
+from dcnet.sketch import CountMinSketch
+from dcnet.sketch import hash64
+from dcnet.sketch import HyperLogLog
+
+from dcnet.snapshot import get_graph_snapshot_path
+from dcnet.snapshot import print_graph_snapshot_stats
+from dcnet.snapshot import write_graph_snapshot
+from dcnet.store import BackgroundMovieWriter
+from dcnet.store import find_loose_movie_path
+from dcnet.store import get_loose_movie_path
+from dcnet.store import get_repo_director_ids
+from dcnet.store import iter_director_movies
+from dcnet.store import iter_repo_movie_payloads
+from dcnet.store import iter_repo_movies
+from dcnet.store import PackedSegment
+from dcnet.store import write_repo_movie
 
 logger = logging.getLogger('dcnet.dcnet')
 
@@ -47,10 +75,33 @@ def get_director_metadata(director_metadata_file):
 
     return movie_dir_details
 
+def get_full_crew_for_movie_job(title_id, set_imdb_details=False):
+
+    '''
+        get_full_crew_for_movie() as a pool job: returns {'movie': ..., 'reason': failure reason}, since an err_info dict filled in a worker process is not seen by the parent
+    '''
+    err_info = {}
+    mov = get_full_crew_for_movie(title_id, set_imdb_details=set_imdb_details, err_info=err_info)
+    return {'movie': mov, 'reason': err_info.get('reason', '')}
+
 def write_director_movie_credits(director_id, repo, max_movies, cache_read=True, **kwargs):
 
+    '''
+        kwargs['director_accumulators']: optional dict (run task), filled with an accumulator (see accumulate_movie()) per director of the movies it would have on disk after this run. Scraped movies are accumulated as they arrive and written by a background thread
+    '''
     logger.info('\nwrite_director_movie_credits()')
     logger.info(f'\tcache_read: {cache_read}')
+    packed_store = kwargs.get('packed_store', False)
+    resume = kwargs.get('resume', False)
+    shard = parse_shard( kwargs.get('shard', '') )
+    shard_by = kwargs.get('shard_by', 'director')
+    #known-bad titles are skipped whenever cached results are trusted, except journaled failures on resume
+    use_negative_cache = (cache_read is True or resume is True) and kwargs.get('ignore_negative_cache', False) is False
+
+    if( shard is not None ):
+        logger.info(f'\tshard: {shard[0]}/{shard[1]} by {shard_by}')
+        if( shard_by == 'director' ):
+            director_id = [ d for d in director_id if in_shard(d, shard) ]
     
     total_directors = len(director_id)
     director_metadata = get_director_metadata(kwargs.get('director_metadata_file', ''))
@@ -58,6 +109,15 @@ def write_director_movie_credits(director_id, repo, max_movies, cache_read=True,
     if( repo is not None ):
         os.makedirs(repo, exist_ok=True)
 
+    #journal is always written, so any run can be resumed
+    journal = ScrapeJournal(repo)
+    negative_cache = NegativeCache( repo, retry_after=parse_retry_after(kwargs.get('retry_after', [])) )
+
+    director_accumulators = kwargs.get('director_accumulators', None)
+    exclude_movie_types = kwargs.get('exclude_movie_types', [])
+    exclude_movie_roles = kwargs.get('exclude_movie_roles', [])
+    writer = BackgroundMovieWriter(repo, packed_store=packed_store) if director_accumulators is not None else None
+
     for i in range(total_directors):
         
         #write director credits - start
@@ -66,16 +126,31 @@ def write_director_movie_credits(director_id, repo, max_movies, cache_read=True,
         dir_cred_filepath = f'{repo}{dir_id}'
         dir_cred_file = f'{dir_cred_filepath}/credits.json'
 
+        if( resume is True and journal.is_director_done(dir_id) ):
+            logger.info(f'\n\tdirector {i+1} of {total_directors}, {dir_id}, done in journal, skipping')
+            continue
+
         os.makedirs(dir_cred_filepath, exist_ok=True)
         os.makedirs(f'{dir_cred_filepath}/movies/', exist_ok=True)
-        if( cache_read is True ):
+        if( cache_read is True or resume is True ):
             dir_cred = getDictFromFile(dir_cred_file)
         
+        #on resume, journaled failures are retried regardless of the negative cache
+        dir_negative = negative_cache.get_active(dir_id) if use_negative_cache is True and (resume is False or journal.get_status(dir_id) != 'failed') else {}
+        if( len(dir_cred) == 0 and len(dir_negative) != 0 ):
+            logger.info( '\n\tdirector {} of {}, {}, in negative cache ({}), skipping'.format(i+1, total_directors, dir_id, dir_negative['reason']) )
+            continue
+
         if( len(dir_cred) == 0 ):
-            dir_cred = get_full_credits_for_director(dir_id)
+            err_info = {}
+            dir_cred = get_full_credits_for_director(dir_id, err_info=err_info)
             if( len(dir_cred) != 0 ):
                 dir_cred['details'] = director_metadata.get(dir_id, {})
                 dumpJsonToFile(dir_cred_file, dir_cred, indentFlag=False)
+                negative_cache.remove(dir_id)
+            else:
+                negative_cache.record( dir_id, err_info.get('reason', 'fetch_error'), director_id=dir_id )
+                negative_cache.save()
 
         credits = dir_cred.get('credits', [])
         director_name = dir_cred.get('director_name', '')
@@ -83,12 +158,18 @@ def write_director_movie_credits(director_id, repo, max_movies, cache_read=True,
         logger.info(f'\n\tdirector {i+1} of {total_directors}, {director_name}, {total_movies} movies\n')
         #write director credits - end
 
+        if( len(dir_cred) == 0 ):
+            journal.record(dir_id, '', 'failed', reason='no director credits')
+            continue
 
         if( max_movies is not None and max_movies > -1 ):
             credits = credits[:max_movies]
             total_movies = len(credits)
 
+        #with the background writer (run task), its own segment is the writer
+        dir_segment = PackedSegment(dir_cred_filepath, writable=packed_store is True and writer is None)
         movie_crew_jobs = []
+        negative_skipped = 0
         for j in range(total_movies):
             
             mov = credits[j]
@@ -96,28 +177,115 @@ def write_director_movie_credits(director_id, repo, max_movies, cache_read=True,
             mov_imdb_id = get_mov_imdb_id(mov_imdb_uri)
             keywords = {'title_id': mov_imdb_id, 'set_imdb_details': True}
             print_msg = f'\t\tmov {j+1} of {total_movies}'
-            mov_file_path = f'{dir_cred_filepath}/movies/{mov_imdb_id}.json.gz'
+            mov_file_path = find_loose_movie_path(repo, dir_id, mov_imdb_id)
+            mov_on_disk = mov_file_path != '' or mov_imdb_id in dir_segment
+            mov_file_path = get_loose_movie_path(repo, dir_id, mov_imdb_id) if mov_file_path == '' else mov_file_path
+
+            if( shard is not None and shard_by == 'title' and in_shard(mov_imdb_id, shard) is False ):
+                continue
 
-            if( cache_read is True and os.path.exists(mov_file_path) is True ):
+            if( cache_read is True and mov_on_disk ):
                 logger.info(f'\t\tmovie cache hit, would skip writing: {mov_file_path}')
                 continue
-            movie_crew_jobs.append({'func': get_full_crew_for_movie, 'args': keywords, 'misc': {'mov_file_path': mov_file_path, 'director_id': dir_id}, 'print': print_msg})
 
-        res_lst = parallelTask(movie_crew_jobs)
-        total_movies = len(res_lst)
-        for j in range(total_movies):
-            
-            mov = res_lst[j]
-            if( len(mov['output']) == 0 ):
+            '''
+                Notes
+                * On resume, titles written before the interruption are skipped. A title file with a "pending" or "failed" journal entry may have been cut off mid-write, so it is fetched again. Files that predate the journal (no entry) are kept.
+            '''
+            mov_status = journal.get_status(dir_id, mov_imdb_id)
+            if( resume is True and mov_on_disk and mov_status in ['done', ''] ):
+                logger.info(f'\t\tmovie done in journal, skipping: {mov_file_path}')
                 continue
+
+            mov_negative = negative_cache.get_active(mov_imdb_id) if use_negative_cache is True and (resume is False or mov_status != 'failed') else {}
+            if( len(mov_negative) != 0 ):
+                negative_skipped += 1
+                logger.info( '\t\tmovie in negative cache ({}, {} attempts), skipping: {}'.format(mov_negative['reason'], mov_negative['attempts'], mov_imdb_id) )
+                continue
+
+            movie_crew_jobs.append({'func': get_full_crew_for_movie_job, 'args': keywords, 'misc': {'mov_file_path': mov_file_path, 'director_id': dir_id}, 'print': print_msg})
+
+        journal.record_pending( dir_id, [job['args']['title_id'] for job in movie_crew_jobs] )
+
+        if( director_accumulators is not None ):
+            #movies on disk that are not refetched are accumulated now; a refetched one is kept in case its fetch fails
+            dir_acc = director_accumulators.setdefault( dir_id, new_movie_accumulator() )
+            job_title_ids = set( job['args']['title_id'] for job in movie_crew_jobs )
+            refetch_fallback = {}
+            for title_id, mov in iter_director_movies(repo, dir_id, with_title_id=True):
+                if( title_id in job_title_ids ):
+                    refetch_fallback[title_id] = mov
+                else:
+                    accumulate_movie(dir_acc, mov, exclude_movie_types, exclude_movie_roles)
+
+        #write and journal each movie as soon as its job completes, so an interruption loses at most the in-flight jobs
+        total_movies = len(movie_crew_jobs)
+        failed_movies = 0
+        j = 0
+        for mov in iterParallelTask(movie_crew_jobs):
             
+            j += 1
             mov_imdb_id = mov['input']['args']['title_id']
-            mov_file_path = mov['misc']['mov_file_path']
+            if( len(mov['output'].get('movie', {})) == 0 ):
+                failed_movies += 1
+                #an exception in the job (no reason set) is most likely a page the parser did not anticipate
+                reason = mov['output'].get('reason', '') if mov['error'] == '' else 'parse_error'
+                reason = 'fetch_error' if reason == '' else reason
+                negative_cache.record(mov_imdb_id, reason, director_id=dir_id)
+                journal.record(dir_id, mov_imdb_id, 'failed', reason=mov['error'] if mov['error'] != '' else reason)
+                if( director_accumulators is not None and mov_imdb_id in refetch_fallback ):
+                    accumulate_movie(dir_acc, refetch_fallback[mov_imdb_id], exclude_movie_types, exclude_movie_roles)
+                continue
+            
+            mov['output'] = mov['output']['movie']
             movie_title = mov['output'].get('title', '')
             mov['output']['director_id'] = mov['misc']['director_id']
 
-            gzipTextFile(mov_file_path, json.dumps(mov['output'], ensure_ascii=False))
-            logger.info(f'\t\twrote crew info {j+1} of {total_movies}: {movie_title}')
+            if( writer is None ):
+                write_repo_movie( repo, mov['misc']['director_id'], mov_imdb_id, mov['output'], segment=dir_segment if packed_store is True else None )
+                journal.record(dir_id, mov_imdb_id, 'done')
+            else:
+                #journaled as done only once written
+                writer.put_movie( mov['misc']['director_id'], mov_imdb_id, mov['output'] )
+                writer.put_call( journal.record, dir_id, mov_imdb_id, 'done' )
+                accumulate_movie(dir_acc, mov['output'], exclude_movie_types, exclude_movie_roles)
+
+            negative_cache.remove(mov_imdb_id)
+            logger.info(f'\t\twrote crew info {j} of {total_movies}: {movie_title}')
+
+        dir_segment.close()
+        negative_cache.save()
+        if( negative_skipped != 0 ):
+            logger.info(f'\t\t{negative_skipped} movies skipped, in negative cache')
+
+        if( writer is not None ):
+            writer.put_director_done(dir_id)
+
+        if( failed_movies == 0 and negative_skipped == 0 ):
+            if( writer is None ):
+                journal.record(dir_id, '', 'done')
+            else:
+                writer.put_call( journal.record, dir_id, '', 'done' )
+        elif( failed_movies != 0 ):
+            logger.info(f'\t\t{failed_movies} of {total_movies} movies failed, retry with --resume')
+
+    if( writer is not None ):
+        logger.info('\twaiting for background writer')
+        writer.close()
+        logger.info(f'\tbackground writer: wrote {writer.written} movies')
+
+    journal.close()
+
+def run_movie_crew_net(director_id, repo, max_movies, exclude_movie_types, cache_read=True, **kwargs):
+
+    '''
+        data and net in one process: scraped movies are streamed into the traversal accumulators while a background thread writes them to repo, so the graph is built without reading them back. Directors not scraped in this run are read from repo as in net
+    '''
+    logger.info('\nrun_movie_crew_net():')
+
+    director_accumulators = {}
+    write_director_movie_credits(director_id, repo, max_movies, cache_read=cache_read, exclude_movie_types=exclude_movie_types, director_accumulators=director_accumulators, **kwargs)
+    gen_movie_crew_net(repo, exclude_movie_types, director_accumulators=director_accumulators, **kwargs)
 
 def normalize_movie_role(role):
     
@@ -276,105 +444,495 @@ def add_movie_crew_stat(all_crew_details):
         crew_dets['unique_role'] = len(crew_roles)
 
 
-def traverse_movies_for_details(repo, exclude_movie_types, **kwargs):
+def normalize_all_movie_roles(mov, exclude_movie_roles):
     
-    def normalize_all_movie_roles(mov, exclude_movie_roles):
-        
-        new_full_credit = []
+    new_full_credit = []
+    
+    for i in range( len(mov['full_credits']) ):
         
-        for i in range( len(mov['full_credits']) ):
-            
-            mov['full_credits'][i]['role'] = normalize_movie_role(mov['full_credits'][i]['role'])
-            if( mov['full_credits'][i]['role'] in exclude_movie_roles ):
-                continue
-            new_full_credit.append( mov['full_credits'][i] )
+        mov['full_credits'][i]['role'] = normalize_movie_role(mov['full_credits'][i]['role'])
+        if( mov['full_credits'][i]['role'] in exclude_movie_roles ):
+            continue
+        new_full_credit.append( mov['full_credits'][i] )
+
+    mov['full_credits'] = new_full_credit
+
+def new_movie_accumulator():
+
+    '''
+        Accumulator of traverse_movies_for_details() results, movies are added with accumulate_movie()
+    '''
+    return {
+        'roles': Counter(),
+        'director_ids': Counter(),
+        'all_crew_details': {},
+        'generic_mov_stats': {'feature_films': 0, 'movie_types': Counter()}
+    }
+
+def get_movie_filter_dets(mov, exclude_movie_types):
+
+    '''
+        Returns (movie_id, movie_type, is_film_feature) of mov, or None if mov is empty or excluded by exclude_movie_types
+    '''
+    if( len(mov) == 0 ):
+        return None
+    
+    movie_type = mov['imdb_details'].get('type', '')
+    if( movie_type in exclude_movie_types ):
+        return None
+    movie_id = get_mov_imdb_id(mov['title_uri'])
+    
+    is_film_feature = is_feature_film('', movie=mov['imdb_details'])
+    #is_film_feature = is_feature_film_v2(movie_id)
+    if( 'feature_films' in exclude_movie_types and is_film_feature ):
+        return None
+
+    if( 'non_feature_films' in exclude_movie_types and is_film_feature is False ):
+        return None
+
+    return movie_id, movie_type, is_film_feature
+
+def accumulate_movie(acc, mov, exclude_movie_types, exclude_movie_roles):
+
+    '''
+        Add mov to acc unless it is excluded. Returns True if mov was added.
+        Note: mov['full_credits'] roles are normalized (and excluded roles removed) in place
+    '''
+    mov_dets = get_movie_filter_dets(mov, exclude_movie_types)
+    if( mov_dets is None ):
+        return False
+
+    movie_id, movie_type, is_film_feature = mov_dets
+    normalize_all_movie_roles(mov, exclude_movie_roles)
+    get_movie_crew( acc['all_crew_details'], movie_id, mov['director_id'], mov['full_credits'] )
+
+    acc['director_ids'][ mov['director_id'] ] += 1
+    acc['roles'].update( [r['role'] for r in mov['full_credits']] )
+    acc['generic_mov_stats']['movie_types'][movie_type] += 1
+
+    if( is_film_feature is True ):
+        acc['generic_mov_stats']['feature_films'] += 1
+
+    return True
+
+def merge_movie_accumulator(acc, other):
+
+    acc['roles'].update( other['roles'] )
+    acc['director_ids'].update( other['director_ids'] )
+    acc['generic_mov_stats']['feature_films'] += other['generic_mov_stats']['feature_films']
+    acc['generic_mov_stats']['movie_types'].update( other['generic_mov_stats']['movie_types'] )
+
+    for crew_imdb_id, crew_dets in other['all_crew_details'].items():
+        acc['all_crew_details'].setdefault( crew_imdb_id, {'name': crew_dets['name'], 'roles': {}} )
+        for dir_crew, roles in crew_dets['roles'].items():
+            acc['all_crew_details'][crew_imdb_id]['roles'].setdefault( dir_crew, set() )
+            acc['all_crew_details'][crew_imdb_id]['roles'][dir_crew] |= set(roles)
+
+def movie_accumulator_to_json(acc):
 
-        mov['full_credits'] = new_full_credit
+    all_crew_details = { crew_imdb_id: {'name': crew_dets['name'], 'roles': {k: sorted(v) for k, v in crew_dets['roles'].items()}} for crew_imdb_id, crew_dets in acc['all_crew_details'].items() }
+    return {
+        'roles': acc['roles'],
+        'director_ids': acc['director_ids'],
+        'all_crew_details': all_crew_details,
+        'generic_mov_stats': acc['generic_mov_stats']
+    }
+
+def movie_accumulator_from_json(acc_json):
+
+    acc = new_movie_accumulator()
+    merge_movie_accumulator( acc, {
+        'roles': Counter(acc_json['roles']),
+        'director_ids': Counter(acc_json['director_ids']),
+        'all_crew_details': acc_json['all_crew_details'],
+        'generic_mov_stats': {'feature_films': acc_json['generic_mov_stats']['feature_films'], 'movie_types': Counter(acc_json['generic_mov_stats']['movie_types'])}
+    })
+
+    return acc
+
+def finalize_movie_accumulator(acc, director_metadata):
+
+    add_movie_crew_stat(acc['all_crew_details'])
+
+    for dir_id in director_metadata:
+        director_metadata[dir_id]['total_movies_directed'] = acc['director_ids'].get(dir_id, -1)
+
+    return {
+        'roles': acc['roles'],
+        'director_ids': acc['director_ids'],
+        'all_crew_details': acc['all_crew_details'],
+        'generic_mov_stats': acc['generic_mov_stats'],
+        'director_metadata': director_metadata
+    }
+
+def get_filter_params(exclude_movie_types, **kwargs):
+
+    '''
+        Parameters that determine the traversal result, see: ResultCache
+    '''
+    return {
+        'exclude_movie_types': sorted(exclude_movie_types),
+        'exclude_movie_roles': sorted( kwargs.get('exclude_movie_roles', []) )
+    }
+
+def get_director_result_cache(repo, **kwargs):
+
+    if( kwargs.get('result_cache', False) is False ):
+        return None
+
+    return ResultCache( f'{repo}{RESULT_CACHE_DIRNAME}', max_size_mb=kwargs.get('result_cache_max_mb', 512) )
 
+def traverse_movies_for_details(repo, exclude_movie_types, **kwargs):
+
+    '''
+        kwargs['director_result_cache']: optional ResultCache. Each director's traversal result (accumulator) is cached, keyed by the filter parameters and the director's movie file manifest, so only directors with changed files or unseen filters are re-read
+        kwargs['director_accumulators']: optional, accumulators streamed by the run task, these directors are not read from disk
+    '''
     director_metadata = get_director_metadata(kwargs.get('director_metadata_file', ''))
     exclude_movie_roles = kwargs.get('exclude_movie_roles', [])
+    result_cache = kwargs.get('director_result_cache', None)
+    director_accumulators = kwargs.get('director_accumulators', {})
 
     print('\ntraverse_movies_for_details()')
     print('\texclude_movie_types:', exclude_movie_types)
     print(f'\trepo: {repo}')
     
-    roles = []
-    director_ids = []
-    all_crew_details = {}
-    generic_mov_stats = {'feature_films': 0, 'movie_types': []}
-    exclude_feature_film = True if 'feature_films' in exclude_movie_types else False
-    exclude_non_feature_film = True if 'non_feature_films' in exclude_movie_types else False
-
-    for mov in glob(f'{repo}/*/movies/*.json.gz'):
-        
-        mov = getDictFromJsonGZ(mov)
-        if( len(mov) == 0 ):
-            continue
-        
-        movie_type = mov['imdb_details'].get('type', '')
-        if( movie_type in exclude_movie_types ):
-            continue
-        movie_id = get_mov_imdb_id(mov['title_uri'])
-        
-        is_film_feature = is_feature_film('', movie=mov['imdb_details'])
-        #is_film_feature = is_feature_film_v2(movie_id)
-        if( exclude_feature_film and is_film_feature ):
+    acc = new_movie_accumulator()
+    director_manifests = {}
+    cache_hits = 0
+
+    for dir_id in get_repo_director_ids(repo):
+
+        if( dir_id in director_accumulators ):
+            merge_movie_accumulator(acc, director_accumulators[dir_id])
+            if( result_cache is not None ):
+                #written by now, so the manifest matches the accumulated movies
+                director_manifests[dir_id] = get_director_manifest(repo, dir_id)
+                key = result_cache.get_key( 'traversal', dir_id, director_manifests[dir_id], get_filter_params(exclude_movie_types, **kwargs) )
+                result_cache.put( key, movie_accumulator_to_json(director_accumulators[dir_id]) )
             continue
 
-        if( exclude_non_feature_film and is_film_feature is False ):
+        if( result_cache is None ):
+            for mov in iter_director_movies(repo, dir_id):
+                accumulate_movie(acc, mov, exclude_movie_types, exclude_movie_roles)
             continue
-        
-        normalize_all_movie_roles(mov, exclude_movie_roles)
-        get_movie_crew( all_crew_details, movie_id, mov['director_id'], mov['full_credits'] )
 
-        director_ids.append(mov['director_id'])
-        roles += [r['role'] for r in mov['full_credits']]
-        generic_mov_stats['movie_types'].append(movie_type)
+        director_manifests[dir_id] = get_director_manifest(repo, dir_id)
+        key = result_cache.get_key( 'traversal', dir_id, director_manifests[dir_id], get_filter_params(exclude_movie_types, **kwargs) )
+        dir_acc = result_cache.get(key)
 
-        if( is_film_feature is True ):
-            generic_mov_stats['feature_films'] += 1
+        if( len(dir_acc) == 0 ):
+            dir_acc = new_movie_accumulator()
+            for mov in iter_director_movies(repo, dir_id):
+                accumulate_movie(dir_acc, mov, exclude_movie_types, exclude_movie_roles)
+            result_cache.put( key, movie_accumulator_to_json(dir_acc) )
+        else:
+            dir_acc = movie_accumulator_from_json(dir_acc)
+            cache_hits += 1
 
-    roles = Counter(roles)
-    director_ids = Counter(director_ids)
-    add_movie_crew_stat(all_crew_details)
-    generic_mov_stats['movie_types'] = Counter( generic_mov_stats['movie_types'] )
+        merge_movie_accumulator(acc, dir_acc)
 
-    for dir_id in director_metadata:
-        director_metadata[dir_id]['total_movies_directed'] = director_ids.get(dir_id, -1)
+    if( result_cache is not None ):
+        print( '\tresult cache hits: {} of {} directors'.format(cache_hits, len(director_manifests)) )
+        result_cache.evict()
 
-    return {
-        'roles': roles,
-        'director_ids': director_ids,
-        'all_crew_details': all_crew_details,
-        'generic_mov_stats': generic_mov_stats,
-        'director_metadata': director_metadata
-    }
+    res = finalize_movie_accumulator(acc, director_metadata)
+    res['director_manifests'] = director_manifests
 
-def print_stats(repo, exclude_movie_types, **kwargs):
+    return res
+
+def get_stats_report(res):
 
-    res = traverse_movies_for_details(repo, exclude_movie_types, **kwargs)
     roles = res['roles']
     generic_mov_stats = res['generic_mov_stats']
 
     total_movies = sum(res['director_ids'].values())
     total_directors = len(res['director_ids'])
     
-    print('\nSummary\nTotal movies: {:,}'.format(total_movies))
+    report = []
+    report.append('\nSummary\nTotal movies: {:,}'.format(total_movies))
+    report.append('Total feature films: {:,}'.format(generic_mov_stats['feature_films']))
+    report.append('Movie types: {}'.format(generic_mov_stats['movie_types']))
+    report.append(f'Total # directors: {total_directors}')
+    report.append('Avg. # movies per directors: {:.2f}'.format(total_movies/total_directors))
+
+    report.append( '\nTotal crews: {:,}'.format(len(res['all_crew_details'])) )
+
+    report.append('\nTotal roles: {}'.format(len(res['roles'])))
+    roles = sorted( roles.items(), key=lambda x: x[0])
+    for i in range(len(roles)):
+        report.append( '\t{}. {} {}'.format(i+1, roles[i][0], roles[i][1]) )
+
+    return '\n'.join(report)
+
+def print_stats(repo, exclude_movie_types, **kwargs):
+
+    if( kwargs.get('graph_snapshot', '') != '' ):
+        print_graph_snapshot_stats(**kwargs)
+        return
+
+    if( kwargs.get('sweep_profiles', '') != '' ):
+        sweep_movie_crew_configs(repo, exclude_movie_types, gen_net=False, **kwargs)
+        return
+
+    if( kwargs.get('approx', False) is True ):
+        print_approx_stats(repo, exclude_movie_types, **kwargs)
+        return
+
+    res = traverse_movies_for_details(repo, exclude_movie_types, **kwargs)
+    print( get_stats_report(res) )
+
+def print_approx_stats(repo, exclude_movie_types, **kwargs):
+
+    '''
+        Approximate print_stats() in one streaming pass with fixed memory: HyperLogLog sketches for distinct crew/titles (overall, per role and per director) and a Count-Min sketch for role frequencies, instead of all_crew_details and exact Counters
+    '''
+    exclude_movie_roles = kwargs.get('exclude_movie_roles', [])
+    precision = kwargs.get('hll_precision', 12)
+    #per-director sketches are many, so use 4 bits less precision (16x smaller)
+    dir_precision = max(4, precision - 4)
+
+    print('\nprint_approx_stats()')
+    print('\texclude_movie_types:', exclude_movie_types)
+    print(f'\trepo: {repo}')
+
+    total_movies = 0
+    generic_mov_stats = {'feature_films': 0, 'movie_types': Counter()}
+    titles_hll = HyperLogLog(precision)
+    crew_hll = HyperLogLog(precision)
+    role_sketches = {}
+    dir_sketches = {}
+    role_cms = CountMinSketch( eps=kwargs.get('cms_eps', 0.001), delta=kwargs.get('cms_delta', 0.01) )
+
+    #sketch updates are buffered (hashes per HyperLogLog, counts per role) and applied in vectorized batches every 1000 movies
+    pending_hashes = {}
+    role_counts = Counter()
+    link_hashes = {}
+    def flush_sketches():
+        for hll, hashes in pending_hashes.items():
+            hll.add_hashes(hashes)
+        pending_hashes.clear()
+        role_cms.update(role_counts)
+        role_counts.clear()
+
+    for mov in iter_repo_movies(repo):
+
+        mov_dets = get_movie_filter_dets(mov, exclude_movie_types)
+        if( mov_dets is None ):
+            continue
+
+        movie_id, movie_type, is_film_feature = mov_dets
+        normalize_all_movie_roles(mov, exclude_movie_roles)
+
+        total_movies += 1
+        generic_mov_stats['movie_types'][movie_type] += 1
+        if( is_film_feature is True ):
+            generic_mov_stats['feature_films'] += 1
+
+        #each id is hashed once for all the sketches it is added to
+        movie_hash = hash64(movie_id)
+        titles_hll.add_hash(movie_hash)
+
+        if( mov['director_id'] not in dir_sketches ):
+            dir_sketches[ mov['director_id'] ] = {'crew': HyperLogLog(dir_precision), 'titles': HyperLogLog(dir_precision)}
+        dir_sketch = dir_sketches[ mov['director_id'] ]
+        dir_sketch['titles'].add_hash(movie_hash)
+
+        crew_hashes = pending_hashes.setdefault( crew_hll, [] )
+        dir_crew_hashes = pending_hashes.setdefault( dir_sketch['crew'], [] )
+        for c in mov['full_credits']:
+
+            role_counts[ c['role'] ] += 1
+            if( c['role'] not in role_sketches ):
+                role_sketches[ c['role'] ] = {'crew': HyperLogLog(precision), 'titles': HyperLogLog(precision)}
+            role_sketch = role_sketches[ c['role'] ]
+            role_sketch['titles'].add_hash(movie_hash)
+
+            role_crew_hashes = []
+            for memb in c['crew']:
+                crew_hash = link_hashes.get( memb['link'] )
+                if( crew_hash is None ):
+                    crew_hash = hash64( get_mov_imdb_id(memb['link'], split_key='/name/') )
+                    link_hashes[ memb['link'] ] = crew_hash
+                role_crew_hashes.append(crew_hash)
+            pending_hashes.setdefault( role_sketch['crew'], [] ).extend(role_crew_hashes)
+
+            #as in get_movie_crew(), directors are not crew of their own movies
+            if( c['role'] != 'Directed by' ):
+                crew_hashes.extend(role_crew_hashes)
+                dir_crew_hashes.extend(role_crew_hashes)
+
+        if( total_movies % 1000 == 0 ):
+            flush_sketches()
+
+        #crew recur across a director's movies; the cache is cleared when full, so memory stays bounded
+        if( len(link_hashes) > 100000 ):
+            link_hashes.clear()
+
+    flush_sketches()
+
+    total_directors = len(dir_sketches)
+    hll_err = 100 * titles_hll.get_error()
+    dir_hll_err = 100 * HyperLogLog(dir_precision).get_error()
+
+    print('\nApproximate summary (HyperLogLog distinct counts: ±{:.1f}% std. error, ±{:.1f}% per director; role frequencies: Count-Min, overestimate <= {:,.0f} with {:.0f}% probability)'.format(hll_err, dir_hll_err, role_cms.get_error_bound(), 100 * (1 - role_cms.delta)))
+    print('Total movies: {:,}'.format(total_movies))
+    print('Distinct titles: ~{:,.0f}'.format(titles_hll.count()))
     print('Total feature films: {:,}'.format(generic_mov_stats['feature_films']))
     print('Movie types:', generic_mov_stats['movie_types'])
     print(f'Total # directors: {total_directors}')
     print('Avg. # movies per directors: {:.2f}'.format(total_movies/total_directors))
 
-    print( '\nTotal crews: {:,}'.format(len(res['all_crew_details'])) )
+    print( '\nDistinct crews: ~{:,.0f}'.format(crew_hll.count()) )
 
-    print('\nTotal roles:', len(res['roles']))
-    roles = sorted( roles.items(), key=lambda x: x[0])
+    print('\nTotal roles:', len(role_sketches))
+    print('\t#. role, frequency, distinct crew, distinct titles')
+    roles = sorted( role_sketches.items(), key=lambda x: x[0] )
     for i in range(len(roles)):
-        print( '\t{}. {} {}'.format(i+1, roles[i][0], roles[i][1]) )
+        role, sketches = roles[i]
+        print( '\t{}. {} ~{:,} ~{:,.0f} ~{:,.0f}'.format(i+1, role, role_cms.estimate(role), sketches['crew'].count(), sketches['titles'].count()) )
+
+    print('\nPer director: distinct crew, distinct titles')
+    for dir_id, sketches in sorted( dir_sketches.items() ):
+        print( '\t{} ~{:,.0f} ~{:,.0f}'.format(dir_id, sketches['crew'].count(), sketches['titles'].count()) )
+
+def get_sweep_profiles(sweep_profiles_file, exclude_movie_types, **kwargs):
+
+    '''
+        sweep_profiles_file: JSON file of named filter profiles, e.g.,
+        {
+            "core_crew": {"exclude_movie_types": ["non_feature_films"], "exclude_movie_roles": ["Cast", "Thanks", "Stunts"]},
+            "all_roles": {"self_loops": true}
+        }
+        Keys missing in a profile take their command-line values.
+    '''
+    profiles = getDictFromFile(sweep_profiles_file)
+    if( len(profiles) == 0 ):
+        logger.error(f'\tget_sweep_profiles(): no profiles in: {sweep_profiles_file}')
+
+    for name, prof in profiles.items():
+        prof.setdefault( 'exclude_movie_types', exclude_movie_types )
+        prof.setdefault( 'exclude_movie_roles', kwargs.get('exclude_movie_roles', []) )
+        prof.setdefault( 'self_loops', kwargs.get('self_loops', False) )
+        prof['filename_slug'] = re.sub(r'[^A-Za-z0-9_\-]+', '_', name)
+
+    return profiles
+
+def traverse_movies_for_sweep(repo, profiles, **kwargs):
+
+    '''
+        Like traverse_movies_for_details() for several filter profiles in one pass: each movie is decoded once and fed to an accumulator per profile.
+        kwargs['director_result_cache']: optional ResultCache, shares the traversal entries of traverse_movies_for_details(), so a director is read only if some profile misses
+        Returns {profile name: traverse_movies_for_details() result}
+    '''
+    print('\ntraverse_movies_for_sweep()')
+    print(f'\tprofiles: {len(profiles)}')
+    print(f'\trepo: {repo}')
+
+    result_cache = kwargs.get('director_result_cache', None)
+    accs = { name: new_movie_accumulator() for name in profiles }
+    director_manifests = {}
+    cache_hits = 0
+
+    for dir_id in get_repo_director_ids(repo):
+
+        #profiles whose accumulator of this director must be read from disk
+        dir_accs = { name: new_movie_accumulator() for name in profiles }
+        keys = {}
+        if( result_cache is not None ):
+            director_manifests[dir_id] = get_director_manifest(repo, dir_id)
+            for name, prof in profiles.items():
+                keys[name] = result_cache.get_key( 'traversal', dir_id, director_manifests[dir_id], get_filter_params(prof['exclude_movie_types'], exclude_movie_roles=prof['exclude_movie_roles']) )
+                dir_acc = result_cache.get( keys[name] )
+                if( len(dir_acc) != 0 ):
+                    merge_movie_accumulator( accs[name], movie_accumulator_from_json(dir_acc) )
+                    dir_accs.pop(name)
+                    cache_hits += 1
+
+        if( len(dir_accs) != 0 ):
+            for mov in iter_director_movies(repo, dir_id):
+
+                if( len(mov) == 0 ):
+                    continue
+
+                for name in dir_accs:
+                    #accumulate_movie() rewrites full_credits in place, so give each profile its own credit dicts, crew lists are shared read-only
+                    prof_mov = dict(mov)
+                    prof_mov['full_credits'] = [ dict(c) for c in mov['full_credits'] ]
+                    accumulate_movie( dir_accs[name], prof_mov, profiles[name]['exclude_movie_types'], profiles[name]['exclude_movie_roles'] )
+
+        for name, dir_acc in dir_accs.items():
+            merge_movie_accumulator(accs[name], dir_acc)
+            if( result_cache is not None ):
+                result_cache.put( keys[name], movie_accumulator_to_json(dir_acc) )
+
+    if( result_cache is not None ):
+        print( '\tresult cache hits: {} of {} director profiles'.format(cache_hits, len(director_manifests) * len(profiles)) )
+        result_cache.evict()
+
+    all_res = {}
+    for name, acc in accs.items():
+        all_res[name] = finalize_movie_accumulator(acc, get_director_metadata(kwargs.get('director_metadata_file', '')))
+        all_res[name]['director_manifests'] = director_manifests
+
+    return all_res
+
+def sweep_movie_crew_configs(repo, exclude_movie_types, gen_net=True, **kwargs):
+
+    '''
+        Write stats_{profile}.txt (and director_crew_graph_{profile}.gexf if gen_net) for each profile in kwargs['sweep_profiles'] from a single repo traversal
+    '''
+    logger.info('\nsweep_movie_crew_configs():')
+
+    profiles = get_sweep_profiles( kwargs['sweep_profiles'], exclude_movie_types, **{k: v for k, v in kwargs.items() if k != 'sweep_profiles'} )
+    result_cache = get_director_result_cache(repo, **kwargs)
+    all_res = traverse_movies_for_sweep(repo, profiles, director_result_cache=result_cache, **kwargs)
+
+    for name, res in all_res.items():
+
+        prof = profiles[name]
+        logger.info(f'\n\tprofile: {name}')
+
+        stats_file = 'stats_{}.txt'.format(prof['filename_slug'])
+        with open(stats_file, 'w') as outfile:
+            outfile.write( 'profile: {}\n{}\n'.format(name, json.dumps({k: v for k, v in prof.items() if k != 'filename_slug'})) )
+            outfile.write( get_stats_report(res) + '\n' )
+        logger.info(f'\twrote {stats_file}')
+
+        if( gen_net is False ):
+            continue
+
+        director_crew_graph, director_crew_dists = gen_pruned_movie_crew_graph(res['all_crew_details'], add_self_loops=prof['self_loops'], **kwargs)
+        filter_params = get_filter_params(prof['exclude_movie_types'], exclude_movie_roles=prof['exclude_movie_roles'])
+        add_cached_attributes_to_mov_crew_graph(res, director_crew_graph, director_crew_dists, filter_params, prof['self_loops'], result_cache, **kwargs)
+        print_dir_role_homogeneity_dets(res['director_metadata'])
+
+        graph_file = 'director_crew_graph_{}.gexf'.format(prof['filename_slug'])
+        write_movie_crew_graph(director_crew_graph, graph_file)
+        logger.info(f'\twrote {graph_file}')
+
+def print_codec_benchmark(repo, max_files=500, repeat=3, **kwargs):
+
+    payloads = []
+    for p in iter_repo_movie_payloads(repo):
+        if( max_files > -1 and len(payloads) == max_files ):
+            break
+        payloads.append(p)
+
+    if( len(payloads) == 0 ):
+        logger.info(f'\nprint_codec_benchmark(): no movie records in repo: {repo}')
+        return
 
+    logger.info( '\nCodec benchmark: {:,} movie records, best of {} runs (MB/s of uncompressed JSON)'.format(len(payloads), repeat) )
+    logger.info( '{:<35} {:>10} {:>10} {:>7}'.format('codec', 'decode', 'encode', 'ratio') )
+    for r in benchmarkCodecs(payloads, repeat=repeat):
+        logger.info( '{:<35} {:>10.1f} {:>10.1f} {:>7.2f}'.format(r['name'], r['decode_mb_per_sec'], r['encode_mb_per_sec'], r['ratio']) )
 
-def gen_movie_crew_graph(all_crew_details, add_self_loops=False):
+def gen_movie_crew_graph(all_crew_details, add_self_loops=False, kept_edges=None):
 
+    '''
+        kept_edges: optional set of (director_id, crew_id) from get_pruned_director_crew_edges(), other edges are never added
+    '''
     director_crew_graph = nx.Graph()
     self_loops = 0
     for crew_id, crew_dets in all_crew_details.items():
@@ -398,21 +956,152 @@ def gen_movie_crew_graph(all_crew_details, add_self_loops=False):
                 #e.g., nm0000881.json
                 continue
             
+            if( kept_edges is not None and (dir_id, crew_id) not in kept_edges ):
+                continue
+
             #cofeat_rate is the fraction of times a crew has worked with the director irrespective of the role
             cofeat_rate = cofeat_count/total_dir_count
             director_crew_graph.add_edge(dir_id, crew_id, cofeat_rate=cofeat_rate)
             
     return director_crew_graph
 
-def add_attributes_to_mov_crew_graph(all_crew_details, director_crew_graph, director_metadata):
+def calc_role_homogeneity_dets(crew_employee_dist):
+
+    '''
+        crew_employee_dist: key is role, value is {crew_id: number of movies the crew worked with the director in role}
+        Returns (crew_employee_dist with role_homogeneity, avg_role_homogeneity)
+    '''
+    sum_role_homogeneity = 0
+    crew_employee_dist = dict(crew_employee_dist)
+    for role, employee_dist in crew_employee_dist.items():
+        
+        #crew_employee_dist[role]: key is the crew_id, value is the number of times they've worked with dir_id
+        total_roles_director_employed = sum(employee_dist.values())
+        unique_count = len(employee_dist.keys())
+        role_homogeneity = calc_homogeneity( unique_count, total_roles_director_employed )
+        crew_employee_dist[role] = {'employee_dist': employee_dist, 'role_homogeneity': role_homogeneity}
+        sum_role_homogeneity += role_homogeneity
+
+    return crew_employee_dist, sum_role_homogeneity/len(crew_employee_dist)
+
+def get_director_crew_employee_dists(all_crew_details, add_self_loops=False):
+
+    '''
+        crew_employee_dist (before role_homogeneity) of every director in one pass over all_crew_details, {director_id: {role: {crew_id: number of movies}}}.
+        Counted from all_crew_details, not the graph's edges, so pruning edges does not change weights or homogeneity
+    '''
+    director_crew_dists = {}
+    for crew_id, crew_dets in all_crew_details.items():
+        for dir_crew, roles in crew_dets['roles'].items():
+
+            dir_id = dir_crew.split('_')[0]
+            if( add_self_loops is False and dir_id == crew_id ):
+                continue
+
+            dir_dist = director_crew_dists.setdefault(dir_id, {})
+            for r in roles:
+                dir_dist.setdefault(r, {})
+                dir_dist[r][crew_id] = dir_dist[r].get(crew_id, 0) + 1
+
+    return director_crew_dists
+
+def get_prune_params(**kwargs):
+
+    return {
+        'min_weight': kwargs.get('min_weight', 0),
+        'min_cofeat_count': kwargs.get('min_cofeat_count', 0),
+        'top_k_crew': kwargs.get('top_k_crew', -1),
+        'prune_degree_one': kwargs.get('prune_degree_one', False)
+    }
+
+def is_pruning(prune_params):
+    return prune_params['min_weight'] > 0 or prune_params['min_cofeat_count'] > 1 or prune_params['top_k_crew'] > -1 or prune_params['prune_degree_one'] is True
+
+def get_pruned_director_crew_edges(all_crew_details, director_crew_dists, add_self_loops=False, min_weight=0, min_cofeat_count=0, top_k_crew=-1, prune_degree_one=False):
+
+    '''
+        Returns the set of (director_id, crew_id) edges to materialize:
+        * min_cofeat_count: the crew worked on at least this many of the director's movies
+        * min_weight: the edge weight (max over roles of the crew's share of the director's role) is at least this
+        * top_k_crew: the crew is among the director's k most employed in at least one role
+        * prune_degree_one: crew (non-directors) left with a single director are dropped
+    '''
+    #weight of each edge, as add_attributes_to_mov_crew_graph() computes it
+    edge_weight = {}
+    top_k_edges = set()
+    for dir_id, dir_dist in director_crew_dists.items():
+        for role, employee_dist in dir_dist.items():
+
+            total_roles_director_employed = sum(employee_dist.values())
+            for crew_id, crew_co_feat in employee_dist.items():
+                edge_weight[(dir_id, crew_id)] = max( edge_weight.get((dir_id, crew_id), 0), crew_co_feat/total_roles_director_employed )
+
+            if( top_k_crew > -1 ):
+                top_k = sorted( employee_dist.items(), key=lambda x: x[1], reverse=True )[:top_k_crew]
+                top_k_edges |= set( (dir_id, crew_id) for crew_id, crew_co_feat in top_k )
+
+    total_edges = 0
+    kept_edges = set()
+    for crew_id, crew_dets in all_crew_details.items():
+
+        cofeat_counts = Counter( dir_crew.split('_')[0] for dir_crew in crew_dets['roles'].keys() )
+        for dir_id, cofeat_count in cofeat_counts.items():
+
+            if( add_self_loops is False and dir_id == crew_id ):
+                continue
+
+            total_edges += 1
+            if( cofeat_count < min_cofeat_count ):
+                continue
+
+            if( edge_weight.get((dir_id, crew_id), 0) < min_weight ):
+                continue
+
+            if( top_k_crew > -1 and (dir_id, crew_id) not in top_k_edges ):
+                continue
+
+            kept_edges.add( (dir_id, crew_id) )
+
+    if( prune_degree_one is True ):
+        crew_degree = Counter( crew_id for dir_id, crew_id in kept_edges )
+        kept_edges = set( e for e in kept_edges if e[1] in director_crew_dists or crew_degree[e[1]] > 1 )
+
+    logger.info( '	pruning: kept {:,} of {:,} edges'.format(len(kept_edges), total_edges) )
+    return kept_edges
+
+def gen_pruned_movie_crew_graph(all_crew_details, add_self_loops=False, **kwargs):
+
+    '''
+        gen_movie_crew_graph() with the pruning options in kwargs (see get_pruned_director_crew_edges()) applied before edges are added.
+        Returns (director_crew_graph, director_crew_dists for add_attributes_to_mov_crew_graph(), None without pruning)
+    '''
+    prune_params = get_prune_params(**kwargs)
+    if( is_pruning(prune_params) is False ):
+        return gen_movie_crew_graph(all_crew_details, add_self_loops=add_self_loops), None
+
+    director_crew_dists = get_director_crew_employee_dists(all_crew_details, add_self_loops=add_self_loops)
+    kept_edges = get_pruned_director_crew_edges(all_crew_details, director_crew_dists, add_self_loops=add_self_loops, **prune_params)
+
+    return gen_movie_crew_graph(all_crew_details, add_self_loops=add_self_loops, kept_edges=kept_edges), director_crew_dists
+
+def add_attributes_to_mov_crew_graph(all_crew_details, director_crew_graph, director_metadata, cached_director_dets=None, director_crew_dists=None, add_self_loops=False):
     
-    def add_employee_dist(crew_employee_id, crew_employee_dist, roles):
-        for r in roles:
-            crew_employee_dist.setdefault(r, {})
-            crew_employee_dist[r].setdefault(crew_employee_id, 0)
-            crew_employee_dist[r][crew_employee_id] += 1
+    '''
+        cached_director_dets: optional, key is director_id, value is {'crew_employee_dist', 'avg_role_homogeneity'} from a previous get_director_crew_employee_dists() and calc_role_homogeneity_dets() with the same inputs
+        director_crew_dists: optional, from get_director_crew_employee_dists() for a pruned graph (see gen_pruned_movie_crew_graph()), so homogeneity is computed from all crew, not only the remaining neighbors
+        add_self_loops: must match the graph's. Without director_crew_dists, crew_employee_dist of uncached directors is computed by get_director_crew_employee_dists() in one pass over all_crew_details
+    '''
+    if( cached_director_dets is None ):
+        cached_director_dets = {}
+
+    pruned = director_crew_dists is not None
+    if( pruned is False and any(dir_id not in cached_director_dets for dir_id in director_metadata) ):
+        director_crew_dists = get_director_crew_employee_dists(all_crew_details, add_self_loops=add_self_loops)
 
     for crew_id, crew_dets in all_crew_details.items():
+        if( pruned is True and crew_id not in director_crew_graph ):
+            #pruned
+            continue
         director_crew_graph.nodes[crew_id]['node_type'] = 'crew'
         director_crew_graph.nodes[crew_id]['name'] = crew_dets['name']
         director_crew_graph.nodes[crew_id]['cust_size'] = 1
@@ -423,39 +1112,27 @@ def add_attributes_to_mov_crew_graph(all_crew_details, director_crew_graph, dire
         #print('director_id:', dir_id, 'employees:', director_crew_graph.degree(dir_id), 'movies directed:', dir_dets['total_movies_directed'])
         #print('director_id:', dir_id)
 
-        avg_crew_homogeneity = 0
-        #dir_dets['crew_employee_dist']: key is role, value is list of IMDb Ids of folks that have functioned in that role
-        dir_dets['crew_employee_dist'] = {}
-        dir_dets['avg_role_homogeneity'] = {'sum_role_homogeneity': 0}
-        
-        for crew_employee_id in director_crew_graph.neighbors(dir_id):
+        if( dir_id in cached_director_dets ):
+            dir_dets['crew_employee_dist'] = cached_director_dets[dir_id]['crew_employee_dist']
+            dir_dets['avg_role_homogeneity'] = cached_director_dets[dir_id]['avg_role_homogeneity']
+        else:
+            dir_dets['crew_employee_dist'], dir_dets['avg_role_homogeneity'] = calc_role_homogeneity_dets( director_crew_dists.get(dir_id, {}) )
 
-            '''
-                Note:
-                Why crew nm0000881 threw key error for dir_id: nm0009190.
-                    for dir_crew, role_dets in all_crew_details[crew_employee_id]['roles'].items():
-                I suspect this happened because nm0000881 is a director and had a role that excluded it from being added to all_crew_details. Thus when nm0009190 invoked it's neighbors, nm0000881 is a neighbor but one without an entry in all_crew_details
-            '''
-            for dir_crew, role_dets in all_crew_details.get(crew_employee_id, {'roles': {}})['roles'].items():
-                
-                #dir_crew is a unique key of format directorid_movieid
-                if( dir_crew.startswith(dir_id) is False ):
-                    continue
-                
-                #every dir_crew here corresponds to a unique movie in which dir_id and crew_employee_id co-costarred
-                add_employee_dist(crew_employee_id, dir_dets['crew_employee_dist'], role_dets)
-                #print(f'\t\t{dir_crew}', role_dets, crew_employee_id)
-            #print()
+        if( pruned is True and dir_id not in director_crew_graph ):
+            #all edges pruned
+            director_crew_graph.add_node(dir_id)
 
-        for role, employee_dist in dir_dets['crew_employee_dist'].items():
-            
-            #employee_dist = Counter(dir_dets['crew_employee_dist'][role])
+        for role, role_dets in dir_dets['crew_employee_dist'].items():
             
-            #dir_dets['crew_employee_dist'][role]: key is the crew_id, value is the number of times they've worked with dir_id
+            employee_dist = role_dets['employee_dist']
             total_roles_director_employed = sum(employee_dist.values())
             
             for crew_id, crew_co_feat in employee_dist.items():
                 
+                if( pruned is True and director_crew_graph.has_edge(dir_id, crew_id) is False ):
+                    #pruned
+                    continue
+
                 weight = crew_co_feat/total_roles_director_employed
 
                 #note (see also remedy for bi-links): it's possible for the same crew to work with the same director under different roles, capture the weights for the different roles, and ensure edges account for these
@@ -464,14 +1141,6 @@ def add_attributes_to_mov_crew_graph(all_crew_details, director_crew_graph, dire
                 
                 director_crew_graph[dir_id][crew_id].setdefault('roles', [])
                 director_crew_graph[dir_id][crew_id]['roles'].append(role) 
-                
-
-            unique_count = len(employee_dist.keys())
-            role_homogeneity = calc_homogeneity( unique_count, total_roles_director_employed )
-            dir_dets['crew_employee_dist'][role] = {'employee_dist': employee_dist, 'role_homogeneity': role_homogeneity}
-            dir_dets['avg_role_homogeneity']['sum_role_homogeneity'] += role_homogeneity
-
-        dir_dets['avg_role_homogeneity'] = dir_dets['avg_role_homogeneity']['sum_role_homogeneity']/len(dir_dets['crew_employee_dist'])
        
         #director_crew_graph.nodes[dir_id]['node_type'] = 'director'
         director_crew_graph.nodes[dir_id]['name'] = dir_dets['firstname'] + ' ' + dir_dets['lastname']
@@ -499,41 +1168,121 @@ def add_attributes_to_mov_crew_graph(all_crew_details, director_crew_graph, dire
             director_crew_graph[dir_id][crew_id].pop('roles')
             
 
-def gen_movie_crew_net(repo, exclude_movie_types, **kwargs):
+def build_movie_crew_graph(repo, exclude_movie_types, **kwargs):
 
-    def print_dir_role_homogeneity_dets(director_metadata):
+    '''
+        Traverse repo, build the director-crew graph and add its attributes.
+        Returns the traverse_movies_for_details() result with the graph under 'director_crew_graph'
+    '''
+    add_self_loops = kwargs.get('self_loops', False)
+    result_cache = get_director_result_cache(repo, **kwargs)
 
-        logger.info( '\ndirector avg. role homogeneity (ARH)' )
-        logger.info( '#, labels, ARH, firstname, lastname, top 3 homogeneous roles' )
+    res = traverse_movies_for_details(repo, exclude_movie_types, director_result_cache=result_cache, **kwargs)
+    director_crew_graph, director_crew_dists = gen_pruned_movie_crew_graph(res['all_crew_details'], add_self_loops=add_self_loops, **kwargs)
 
-        all_dir_dets = sorted( director_metadata.items(), key=lambda x: x[1]['avg_role_homogeneity'], reverse=True )
-        
-        for i in range(len(all_dir_dets)):
+    add_cached_attributes_to_mov_crew_graph(res, director_crew_graph, director_crew_dists, get_filter_params(exclude_movie_types, **kwargs), add_self_loops, result_cache, **kwargs)
+    res['director_crew_graph'] = director_crew_graph
 
-            #dict_keys(['lastname', 'firstname', 'sex', 'ethnicity_race', 'labels', 'imdb_uri', 'director_id', 'total_movies_directed', 'crew_employee_dist', 'avg_crew_homogeneity'])
-            dir_id = all_dir_dets[i][0]
-            dir_dets = all_dir_dets[i][1]
-            
-            crew_homogeneity = sorted( dir_dets['crew_employee_dist'].items(), key=lambda x: x[1]['role_homogeneity'], reverse=True )[:3]
-            crew_homogeneity = ' & '.join([c[0] for c in crew_homogeneity])
+    return res
 
-            firstname = dir_dets['firstname']
-            lastname = dir_dets['lastname']
-            avg_crew_homogeneity = dir_dets['avg_role_homogeneity']
-            dir_lab = '{}{}{}'.format(dir_dets['sex'], dir_dets['ethnicity_race'], dir_dets['labels'])
-            
-            logger.info( '{:3d}. {:<3} {:.3f} {:<25} {}'.format(i+1, dir_lab, avg_crew_homogeneity, firstname + ' ' + lastname, crew_homogeneity) )
+def add_cached_attributes_to_mov_crew_graph(res, director_crew_graph, director_crew_dists, filter_params, add_self_loops, director_result_cache, **kwargs):
+
+    '''
+        add_attributes_to_mov_crew_graph() with the director details of director_result_cache (optional ResultCache), then the bootstrap intervals (kwargs['bootstrap'])
+    '''
+    #a director's crew_employee_dist (and so edge weights and homogeneity) depends only on its own movies, the filters and self_loops
+    cached_director_dets = {}
+    director_keys = {}
+    if( director_result_cache is not None ):
+        for dir_id in res['director_metadata']:
+            if( dir_id in res['director_manifests'] ):
+                director_keys[dir_id] = director_result_cache.get_key( 'director_dets', dir_id, res['director_manifests'][dir_id], filter_params, add_self_loops )
+                dir_dets = director_result_cache.get( director_keys[dir_id] )
+                if( len(dir_dets) != 0 ):
+                    cached_director_dets[dir_id] = dir_dets
+
+    add_attributes_to_mov_crew_graph(res['all_crew_details'], director_crew_graph, res['director_metadata'], cached_director_dets=cached_director_dets, director_crew_dists=director_crew_dists, add_self_loops=add_self_loops)
+
+    if( director_result_cache is not None ):
+        logger.info( '\tresult cache hits: {} of {} director details'.format(len(cached_director_dets), len(director_keys)) )
+        for dir_id, key in director_keys.items():
+            if( dir_id not in cached_director_dets ):
+                dir_dets = res['director_metadata'][dir_id]
+                director_result_cache.put( key, {'crew_employee_dist': dir_dets['crew_employee_dist'], 'avg_role_homogeneity': dir_dets['avg_role_homogeneity']} )
+        director_result_cache.evict()
+
+    #after the result cache, whose entries do not depend on --bootstrap
+    if( kwargs.get('bootstrap', 0) > 0 ):
+        add_bootstrap_homogeneity( res['all_crew_details'], director_crew_graph, res['director_metadata'], resamples=kwargs['bootstrap'], alpha=kwargs.get('bootstrap_alpha', 0.05), add_self_loops=add_self_loops, seed=kwargs.get('bootstrap_seed', 0) )
+
+def write_movie_crew_graph(director_crew_graph, graph_file):
+
+    '''
+        Write graph_file (GEXF) and its binary snapshot (see snapshot.py) for fast loading by ana, vis and serve
+    '''
+    nx.write_gexf(director_crew_graph, graph_file)
+    write_graph_snapshot( director_crew_graph, get_graph_snapshot_path(graph_file), graph_file=graph_file )
+
+def get_dir_role_homogeneity_rank_key(dir_item):
+
+    '''
+        dir_item: (director_id, director details). Sort key (descending) of print_dir_role_homogeneity_dets()
+    '''
+    dir_dets = dir_item[1]
+    avg_role_homogeneity = dir_dets['avg_role_homogeneity']
+
+    if( 'avg_role_homogeneity_ci' not in dir_dets ):
+        return (1, avg_role_homogeneity, avg_role_homogeneity)
+
+    if( dir_dets['avg_role_homogeneity_ci'] is None ):
+        return (0, avg_role_homogeneity, avg_role_homogeneity)
+
+    return (1, dir_dets['avg_role_homogeneity_ci'][0], avg_role_homogeneity)
+
+def print_dir_role_homogeneity_dets(director_metadata):
+
+    logger.info( '\ndirector avg. role homogeneity (ARH)' )
+    logger.info( '#, labels, ARH, [ARH bootstrap interval,] firstname, lastname, top 3 homogeneous roles' )
+
+    #with bootstrap intervals (net --bootstrap), rank by the lower bound, so directors with few movies do not flip ranks on noise. Directors with an undefined interval (e.g., a single title) come last
+    all_dir_dets = sorted( director_metadata.items(), key=get_dir_role_homogeneity_rank_key, reverse=True )
+
+    for i in range(len(all_dir_dets)):
+
+        #dict_keys(['lastname', 'firstname', 'sex', 'ethnicity_race', 'labels', 'imdb_uri', 'director_id', 'total_movies_directed', 'crew_employee_dist', 'avg_crew_homogeneity'])
+        dir_id = all_dir_dets[i][0]
+        dir_dets = all_dir_dets[i][1]
+
+        crew_homogeneity = sorted( dir_dets['crew_employee_dist'].items(), key=lambda x: x[1]['role_homogeneity'], reverse=True )[:3]
+        crew_homogeneity = ' & '.join([c[0] for c in crew_homogeneity])
+
+        firstname = dir_dets['firstname']
+        lastname = dir_dets['lastname']
+        avg_crew_homogeneity = dir_dets['avg_role_homogeneity']
+        dir_lab = '{}{}{}'.format(dir_dets['sex'], dir_dets['ethnicity_race'], dir_dets['labels'])
+
+        if( 'avg_role_homogeneity_ci' in dir_dets and dir_dets['avg_role_homogeneity_ci'] is None ):
+            avg_crew_homogeneity = '{:.3f} [undefined]'.format(avg_crew_homogeneity)
+        elif( 'avg_role_homogeneity_ci' in dir_dets ):
+            avg_crew_homogeneity = '{:.3f} [{:.3f}, {:.3f}]'.format(avg_crew_homogeneity, *dir_dets['avg_role_homogeneity_ci'])
+        else:
+            avg_crew_homogeneity = '{:.3f}'.format(avg_crew_homogeneity)
+
+        logger.info( '{:3d}. {:<3} {} {:<25} {}'.format(i+1, dir_lab, avg_crew_homogeneity, firstname + ' ' + lastname, crew_homogeneity) )
+
+def gen_movie_crew_net(repo, exclude_movie_types, **kwargs):
+
+    if( kwargs.get('sweep_profiles', '') != '' ):
+        sweep_movie_crew_configs(repo, exclude_movie_types, gen_net=True, **kwargs)
+        return
 
     logger.info('\ngen_movie_crew_net():')
-    add_self_loops = kwargs.get('self_loops', False)
 
-    res = traverse_movies_for_details(repo, exclude_movie_types, **kwargs)
+    res = build_movie_crew_graph(repo, exclude_movie_types, **kwargs)
     all_crew_details = res['all_crew_details']
     director_metadata = res['director_metadata']
+    director_crew_graph = res['director_crew_graph']
 
-    
-    director_crew_graph = gen_movie_crew_graph(all_crew_details, add_self_loops=add_self_loops)
-    add_attributes_to_mov_crew_graph(all_crew_details, director_crew_graph, director_metadata)
     print_dir_role_homogeneity_dets(director_metadata)
 
     '''
@@ -544,5 +1293,5 @@ def gen_movie_crew_net(repo, exclude_movie_types, **kwargs):
     '''
 
     logger.info('\tis connected: {}, writing director_crew_graph.gexf'.format(nx.is_connected(director_crew_graph)))
-    nx.write_gexf(director_crew_graph, 'director_crew_graph.gexf')
+    write_movie_crew_graph(director_crew_graph, 'director_crew_graph.gexf')
     logger.info('\tdone writing')
@@ -0,0 +1,146 @@
+'''
+bootstrap.py
+Bootstrap confidence intervals of role homogeneity (net --bootstrap B)
+
+Each director's titles are resampled with replacement B times. A director's movies are encoded once as a binary title x (role, crew) matrix X, so a batch of resamples, given as title multiplicities W (B x titles), yields every resampled employee_dist at once: W @ X. Role homogeneity (see util.calc_homogeneity()) and avg_role_homogeneity then follow from per-role sums of the columns, without re-running the pipeline.
+
+Resampling with replacement repeats titles, which reads as repeat employment and biases homogeneity upward, often by more than its spread (so percentile and reverse percentile intervals can both exclude the observed value). Intervals are therefore normal intervals from the bootstrap standard error, observed +/- z(1 - alpha/2) * se, clipped to [0, 1].
+
+A director with a single title (or whose resamples show no spread) gives no evidence of variability, so its interval is undefined (None, NaN se) rather than collapsed to the observed value.
+'''
+import logging
+import numpy as np
+
+from statistics import NormalDist
+
+logger = logging.getLogger('dcnet.dcnet')
+
+def get_director_title_role_crew(all_crew_details, add_self_loops=False):
+
+    '''
+        Returns {director_id: [(title_id, role, crew_id)]}, the entries get_director_crew_employee_dists() counts, in one pass over all_crew_details
+    '''
+    director_entries = {}
+    for crew_id, crew_dets in all_crew_details.items():
+        for dir_crew, roles in crew_dets['roles'].items():
+
+            dir_id, title_id = dir_crew.split('_')
+            if( add_self_loops is False and dir_id == crew_id ):
+                continue
+
+            entries = director_entries.setdefault(dir_id, [])
+            for r in roles:
+                entries.append( (title_id, r, crew_id) )
+
+    return director_entries
+
+def get_title_role_crew_matrix(entries):
+
+    '''
+        Returns (X, col_role, roles, total_titles):
+        * X: titles x (role, crew) 0/1 float64 matrix, columns sorted by role
+        * col_role: role index of each column
+        * roles: role names
+    '''
+    title_ids, title_index = np.unique( [e[0] for e in entries], return_inverse=True )
+    role_crew, col_index = np.unique( [f'{e[1]}\t{e[2]}' for e in entries], return_inverse=True )
+    roles, col_role = np.unique( [rc.split('\t')[0] for rc in role_crew], return_inverse=True )
+
+    X = np.zeros( (len(title_ids), len(role_crew)) )
+    X[title_index, col_index] = 1
+
+    return X, col_role, roles.tolist(), len(title_ids)
+
+def calc_bootstrap_role_homogeneity(X, col_role, total_roles, W):
+
+    '''
+        W: resamples x titles multiplicities.
+        Returns (role_homogeneity: resamples x roles, NaN where the role is absent from a resample; avg_role_homogeneity: resamples)
+    '''
+    counts = W @ X
+    #role boundaries of the (sorted) columns
+    role_starts = np.searchsorted( col_role, np.arange(total_roles) )
+
+    total = np.add.reduceat(counts, role_starts, axis=1)
+    unique_count = np.add.reduceat( (counts > 0).astype(np.float64), role_starts, axis=1 )
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        role_homogeneity = np.where( unique_count == 1, 1.0, 1 - unique_count/total )
+    role_homogeneity[total == 0] = np.nan
+
+    #average over the roles present in each resample, as calc_role_homogeneity_dets()
+    avg_role_homogeneity = np.nanmean(role_homogeneity, axis=1)
+    return role_homogeneity, avg_role_homogeneity
+
+def bootstrap_director_homogeneity(entries, resamples=1000, alpha=0.05, rng=None, batch_size=256):
+
+    '''
+        Returns {'avg_role_homogeneity_ci': [low, high], 'avg_role_homogeneity_se': ..., 'role_homogeneity_ci': {role: [low, high]}}, normal intervals at 1 - alpha.
+        Intervals are None (and se NaN) with fewer than 2 titles or no spread across resamples
+    '''
+    rng = np.random.default_rng(0) if rng is None else rng
+    X, col_role, roles, total_titles = get_title_role_crew_matrix(entries)
+    obs_role_homogeneity, obs_avg = calc_bootstrap_role_homogeneity( X, col_role, len(roles), np.ones((1, total_titles)) )
+
+    all_role_homogeneity = []
+    all_avg = []
+    for start in range(0, resamples, batch_size):
+        size = min(batch_size, resamples - start)
+        W = rng.multinomial( total_titles, np.full(total_titles, 1/total_titles), size=size ).astype(np.float64)
+        role_homogeneity, avg_role_homogeneity = calc_bootstrap_role_homogeneity(X, col_role, len(roles), W)
+        all_role_homogeneity.append(role_homogeneity)
+        all_avg.append(avg_role_homogeneity)
+
+    role_homogeneity = np.concatenate(all_role_homogeneity)
+    avg_role_homogeneity = np.concatenate(all_avg)
+    z = NormalDist().inv_cdf(1 - alpha/2)
+
+    se = float( np.std(avg_role_homogeneity, ddof=1) ) if resamples > 1 else 0.0
+    if( total_titles < 2 or se == 0 ):
+        avg_ci = None
+        se = float('nan')
+    else:
+        avg_ci = [ float(v) for v in np.clip([obs_avg[0] - z*se, obs_avg[0] + z*se], 0, 1) ]
+
+    #roles absent from a resample (NaN) do not count
+    with np.errstate(invalid='ignore'):
+        role_se = np.nan_to_num( np.nanstd(role_homogeneity, axis=0, ddof=1) ) if resamples > 1 else np.zeros(len(roles))
+    role_low = np.clip( obs_role_homogeneity[0] - z*role_se, 0, 1 )
+    role_high = np.clip( obs_role_homogeneity[0] + z*role_se, 0, 1 )
+
+    role_ci = {}
+    for i in range(len(roles)):
+        role_ci[roles[i]] = None if total_titles < 2 or role_se[i] == 0 else [float(role_low[i]), float(role_high[i])]
+
+    return {
+        'avg_role_homogeneity_ci': avg_ci,
+        'avg_role_homogeneity_se': se,
+        'role_homogeneity_ci': role_ci
+    }
+
+def add_bootstrap_homogeneity(all_crew_details, director_crew_graph, director_metadata, resamples=1000, alpha=0.05, add_self_loops=False, seed=0):
+
+    '''
+        Add avg_role_homogeneity confidence intervals to director_metadata (and director nodes of director_crew_graph), after add_attributes_to_mov_crew_graph()
+    '''
+    logger.info( '\tbootstrap: {} resamples of titles per director, {:.0f}% intervals'.format(resamples, 100 * (1 - alpha)) )
+
+    rng = np.random.default_rng(seed)
+    director_entries = get_director_title_role_crew(all_crew_details, add_self_loops=add_self_loops)
+    for dir_id, dir_dets in director_metadata.items():
+
+        if( dir_id not in director_entries ):
+            continue
+
+        boot = bootstrap_director_homogeneity( director_entries[dir_id], resamples=resamples, alpha=alpha, rng=rng )
+        dir_dets['avg_role_homogeneity_ci'] = boot['avg_role_homogeneity_ci']
+        dir_dets['avg_role_homogeneity_se'] = boot['avg_role_homogeneity_se']
+        for role, role_ci in boot['role_homogeneity_ci'].items():
+            if( role in dir_dets.get('crew_employee_dist', {}) ):
+                dir_dets['crew_employee_dist'][role]['role_homogeneity_ci'] = role_ci
+
+        if( dir_id in director_crew_graph ):
+            avg_ci = boot['avg_role_homogeneity_ci'] if boot['avg_role_homogeneity_ci'] is not None else [float('nan'), float('nan')]
+            director_crew_graph.nodes[dir_id]['avg_role_homogeneity_ci_low'] = avg_ci[0]
+            director_crew_graph.nodes[dir_id]['avg_role_homogeneity_ci_high'] = avg_ci[1]
+            director_crew_graph.nodes[dir_id]['avg_role_homogeneity_se'] = boot['avg_role_homogeneity_se']
@@ -0,0 +1,180 @@
+'''
+ego.py
+Ego-network extraction (net --ego nm0027572 --hops 2) without traversing the whole repo
+
+A crew index ({repo}.dcnet_cache/crew_index.json.gz) maps each director's titles to their crew, and each crew to the titles they worked on (the inverted map), so the k-hop neighborhood of the ego directors is found without reading movie files. Only the movies needed for exact attributes of the neighborhood are then read:
+* every title of each director in the neighborhood (crew_employee_dist, so edge weight/role and avg_role_homogeneity)
+* every title of each crew in the neighborhood (cofeat_rate)
+The index is refreshed incrementally: only directors whose movie file manifest changed are re-read, and only their entries of the inverted map are replaced. A query checks each director with two stat() calls (store.get_director_store_stamp()), and lists its movie files for the manifest only if that stamp changed. The search itself only looks up the nodes it reaches.
+'''
+import logging
+import networkx as nx
+import os
+
+from dcnet.backbone import accumulate_movie
+from dcnet.backbone import add_attributes_to_mov_crew_graph
+from dcnet.backbone import finalize_movie_accumulator
+from dcnet.backbone import gen_movie_crew_graph
+from dcnet.backbone import get_director_metadata
+from dcnet.backbone import new_movie_accumulator
+from dcnet.backbone import write_movie_crew_graph
+from dcnet.result_cache import get_director_manifest
+from dcnet.store import get_director_store_stamp
+from dcnet.store import get_repo_director_ids
+from dcnet.store import iter_director_movies
+from dcnet.store import iter_director_movies_by_title
+from dcnet.util import get_mov_imdb_id
+from dcnet.util import getDictFromJsonGZ
+from dcnet.util import gzipTextFile
+from dcnet.util import jsonDumpsBytes
+
+logger = logging.getLogger('dcnet.dcnet')
+
+CREW_INDEX_VERSION = 3
+CREW_INDEX_FILENAME = '.dcnet_cache/crew_index.json.gz'
+
+def get_title_crew_ids(mov):
+
+    crew_ids = set()
+    for c in mov.get('full_credits', []):
+        if( c['role'] == 'Directed by' ):
+            continue
+        for memb in c['crew']:
+            crew_ids.add( get_mov_imdb_id(memb['link'], split_key='/name/') )
+
+    return sorted(crew_ids)
+
+def add_director_crew_titles(crew_titles, dir_id, titles):
+
+    for title_id, crew_ids in titles.items():
+        for crew_id in crew_ids:
+            crew_titles.setdefault( crew_id, {} ).setdefault( dir_id, [] ).append(title_id)
+
+def remove_director_crew_titles(crew_titles, dir_id, titles):
+
+    for crew_id in set().union( *titles.values() ):
+        dir_titles = crew_titles.get(crew_id, {})
+        dir_titles.pop(dir_id, None)
+        if( crew_id in crew_titles and len(dir_titles) == 0 ):
+            del crew_titles[crew_id]
+
+def load_crew_index(repo):
+
+    '''
+        Returns {'directors': {director_id: {'stamp': ..., 'manifest': ..., 'titles': {title_id: [crew ids of all roles except "Directed by"]}}}, 'crew_titles': {crew_id: {director_id: [title ids]}}}, refreshed for directors whose movie files changed
+    '''
+    index_path = f'{repo}{CREW_INDEX_FILENAME}'
+    index = getDictFromJsonGZ(index_path) if os.path.exists(index_path) else {}
+    if( index.get('version') != CREW_INDEX_VERSION ):
+        index = {'version': CREW_INDEX_VERSION, 'directors': {}, 'crew_titles': {}}
+
+    repo_director_ids = get_repo_director_ids(repo)
+    updated = 0
+    restamped = 0
+    for dir_id in repo_director_ids:
+
+        dir_index = index['directors'].get(dir_id, {})
+        stamp = get_director_store_stamp(repo, dir_id)
+        if( dir_index.get('stamp') == stamp ):
+            continue
+
+        #stamp changed (e.g., a file touched or replaced by identical content): re-read only if the manifest changed too
+        manifest = get_director_manifest(repo, dir_id)
+        if( dir_index.get('manifest') == manifest ):
+            dir_index['stamp'] = stamp
+            restamped += 1
+            continue
+
+        titles = {}
+        for title_id, mov in iter_director_movies(repo, dir_id, with_title_id=True):
+            titles[title_id] = get_title_crew_ids(mov)
+
+        remove_director_crew_titles( index['crew_titles'], dir_id, dir_index.get('titles', {}) )
+        add_director_crew_titles( index['crew_titles'], dir_id, titles )
+        index['directors'][dir_id] = {'stamp': stamp, 'manifest': manifest, 'titles': titles}
+        updated += 1
+
+    removed = set(index['directors']) - set(repo_director_ids)
+    for dir_id in removed:
+        remove_director_crew_titles( index['crew_titles'], dir_id, index['directors'].pop(dir_id)['titles'] )
+
+    if( updated != 0 or restamped != 0 or len(removed) != 0 ):
+        os.makedirs( os.path.dirname(index_path), exist_ok=True )
+        gzipTextFile( index_path, jsonDumpsBytes(index) )
+        logger.info(f'\tcrew index: updated {updated}, removed {len(removed)} directors of {len(repo_director_ids)}')
+
+    return index
+
+def get_ego_node_titles(crew_index, ego_ids, hops):
+
+    '''
+        Breadth-first search of the director-crew graph implied by crew_index (before role/type filters, so a superset of the filtered graph), looking up only the nodes reached.
+        Returns (ego nodes within hops, {director_id: set of title ids to read})
+    '''
+    directors = crew_index['directors']
+    crew_titles = crew_index['crew_titles']
+
+    def get_neighbors(node):
+        neighbors = set( crew_titles.get(node, {}) )
+        for crew_ids in directors.get(node, {'titles': {}})['titles'].values():
+            neighbors.update(crew_ids)
+        return neighbors
+
+    ego_nodes = set( n for n in ego_ids if n in directors or n in crew_titles )
+    frontier = set(ego_nodes)
+    for _ in range(hops):
+        frontier = set().union( *[get_neighbors(n) for n in frontier] ) - ego_nodes
+        ego_nodes |= frontier
+
+    #every title of each node (director or crew) in the neighborhood
+    read_titles = {}
+    for node in ego_nodes:
+        if( node in directors ):
+            read_titles.setdefault( node, set() ).update( directors[node]['titles'] )
+        for dir_id, title_ids in crew_titles.get(node, {}).items():
+            read_titles.setdefault( dir_id, set() ).update(title_ids)
+
+    return ego_nodes, read_titles
+
+def gen_ego_movie_crew_net(repo, exclude_movie_types, ego, hops=1, **kwargs):
+
+    logger.info('\ngen_ego_movie_crew_net():')
+    logger.info(f'\tego: {ego}, hops: {hops}')
+
+    add_self_loops = kwargs.get('self_loops', False)
+    exclude_movie_roles = kwargs.get('exclude_movie_roles', [])
+
+    crew_index = load_crew_index(repo)
+    ego_nodes, read_titles = get_ego_node_titles(crew_index, ego, hops)
+    total_titles = sum( len(t) for t in read_titles.values() )
+    logger.info( '\tneighborhood: {:,} nodes, reading {:,} of {:,} movies'.format(len(ego_nodes), total_titles, sum(len(d['titles']) for d in crew_index['directors'].values())) )
+
+    acc = new_movie_accumulator()
+    for dir_id, title_ids in sorted( read_titles.items() ):
+        for mov in iter_director_movies_by_title(repo, dir_id, sorted(title_ids)):
+            accumulate_movie(acc, mov, exclude_movie_types, exclude_movie_roles)
+
+    #attributes are exact only for directors in the neighborhood, all of whose movies were read
+    director_metadata = { dir_id: dir_dets for dir_id, dir_dets in get_director_metadata(kwargs.get('director_metadata_file', '')).items() if dir_id in ego_nodes }
+    res = finalize_movie_accumulator(acc, director_metadata)
+
+    director_crew_graph = gen_movie_crew_graph(res['all_crew_details'], add_self_loops=add_self_loops)
+    res['director_metadata'] = { dir_id: dir_dets for dir_id, dir_dets in director_metadata.items() if dir_id in director_crew_graph }
+    add_attributes_to_mov_crew_graph(res['all_crew_details'], director_crew_graph, res['director_metadata'], add_self_loops=add_self_loops)
+
+    ego_graph = nx.Graph()
+    for ego_id in ego:
+        if( ego_id not in director_crew_graph ):
+            logger.warning(f'\t{ego_id} not in graph, skipping')
+            continue
+        ego_graph = nx.compose( ego_graph, nx.ego_graph(director_crew_graph, ego_id, radius=hops) )
+
+    graph_file = kwargs.get('ego_output', '')
+    if( graph_file == '' ):
+        graph_file = 'director_crew_graph_ego_{}_{}hops.gexf'.format('_'.join(ego), hops)
+
+    logger.info( '\tego graph: {:,} nodes, {:,} edges, writing {}'.format(ego_graph.number_of_nodes(), ego_graph.number_of_edges(), graph_file) )
+    write_movie_crew_graph(ego_graph, graph_file)
+    logger.info('\tdone writing')
+
+    return ego_graph
@@ -23,7 +23,36 @@ from NwalaTextUtils.textutils import getPgTitleFrmHTML
 
 from PyMovieDb import IMDB
 
-def get_full_credits_for_director(dir_id):
+def set_err_reason(err_info, reason):
+    if( err_info is not None ):
+        err_info['reason'] = reason
+
+def get_imdb_page(uri, err_info=None):
+
+    '''
+        Returns the HTML of uri, '' on failure with err_info['reason'] set to dead_title (HTTP 404/410) or fetch_error
+    '''
+    res = derefURI(uri, addResponseHeader=True)
+    if( isinstance(res, dict) is False ):
+        set_err_reason(err_info, 'fetch_error')
+        return ''
+
+    status_code = res['response_history'][-1]['status_code']
+    if( status_code in [404, 410] ):
+        set_err_reason(err_info, 'dead_title')
+        return ''
+
+    if( status_code >= 400 or res['text'] == '' ):
+        set_err_reason(err_info, 'fetch_error')
+        return ''
+
+    return res['text']
+
+def get_full_credits_for_director(dir_id, err_info=None):
+
+    '''
+        err_info: optional dict, on failure ({} returned) err_info['reason'] is one of: dead_title, fetch_error, parse_error, no_director_credits
+    '''
 
     def get_movie_link(mov_elm, mov_year):
         
@@ -54,8 +83,10 @@ def get_full_credits_for_director(dir_id):
         return None
 
     uri = f'https://www.imdb.com/name/{dir_id}/fullcredits/'
-    html_pg = derefURI(uri)
+    html_pg = get_imdb_page(uri, err_info=err_info)
     title = ''
+    if( html_pg == '' ):
+        return {}
 
     try:
         soup = BeautifulSoup(html_pg, 'html.parser')
@@ -63,11 +94,13 @@ def get_full_credits_for_director(dir_id):
         title = title.split('-')[0].strip()
     except:
         genericErrorInfo()
+        set_err_reason(err_info, 'parse_error')
         return {}
 
 
     movies = get_movies_section(soup)
     if( movies is None ):
+        set_err_reason(err_info, 'no_director_credits')
         return {}
     
     dir_credits = {'director_name': title, 'imdb_uri': uri, 'credits': []}
@@ -80,7 +113,11 @@ def get_full_credits_for_director(dir_id):
         
     return dir_credits
 
-def get_full_crew_for_movie(title_id, set_imdb_details=False):
+def get_full_crew_for_movie(title_id, set_imdb_details=False, err_info=None):
+
+    '''
+        err_info: optional dict, on failure ({} returned) err_info['reason'] is one of: dead_title, fetch_error, parse_error, no_fullcredits_content
+    '''
 
     def get_crew_table_dets(crew_tab):
     
@@ -116,7 +153,9 @@ def get_full_crew_for_movie(title_id, set_imdb_details=False):
 
     full_credits = {}
     uri = f'https://www.imdb.com/title/{title_id}/fullcredits/'
-    html_pg = derefURI(uri)
+    html_pg = get_imdb_page(uri, err_info=err_info)
+    if( html_pg == '' ):
+        return {}
 
     try:
         soup = BeautifulSoup(html_pg, 'html.parser')
@@ -124,11 +163,13 @@ def get_full_crew_for_movie(title_id, set_imdb_details=False):
         title = title.split('-')[0].strip()
     except:
         genericErrorInfo()
+        set_err_reason(err_info, 'parse_error')
         return {}
 
 
     soup = soup.find('div', id='fullcredits_content')
     if( soup is None ):
+        set_err_reason(err_info, 'no_fullcredits_content')
         return {}
 
     headers = soup.find_all(class_='dataHeaderWithBorder')
@@ -0,0 +1,97 @@
+'''
+journal.py
+Append-only journal of scraping jobs, so interrupted "data" runs can resume (data --resume)
+
+Each line of {repo}journal.jsonl is a JSON object:
+* {"ts": ..., "director_id": "nm0027572", "title_id": "tt0128445", "status": "pending" | "done" | "failed", "reason": ""}
+* title_id is "" for director-level entries: "done" is recorded once every title of the director is done
+The last entry of a (director_id, title_id) pair is its current status.
+'''
+import json
+import logging
+import os
+import threading
+import time
+
+from dcnet.util import genericErrorInfo
+
+logger = logging.getLogger('dcnet.dcnet')
+
+JOURNAL_FILENAME = 'journal.jsonl'
+
+class ScrapeJournal(object):
+
+    def __init__(self, repo):
+
+        self.path = f'{repo}{JOURNAL_FILENAME}'
+        self.status = {}
+        self._file = None
+        #record() is also called from the background writer of the run task
+        self._lock = threading.Lock()
+        self.load()
+
+    def load(self):
+
+        if( os.path.exists(self.path) is False ):
+            return
+
+        with open(self.path, 'r') as infile:
+            for line in infile:
+                try:
+                    entry = json.loads(line)
+                except:
+                    #partially written last line of an interrupted run
+                    continue
+
+                self.status[ (entry['director_id'], entry['title_id']) ] = entry
+
+    def record(self, director_id, title_id, status, reason=''):
+        self.record_entries([ (director_id, title_id, status, reason) ])
+
+    def record_entries(self, entries):
+
+        '''
+            entries: list of (director_id, title_id, status, reason), written in one append and made durable with a single fsync
+        '''
+        if( len(entries) == 0 ):
+            return
+
+        ts = time.time()
+        entries = [ {'ts': ts, 'director_id': director_id, 'title_id': title_id, 'status': status, 'reason': reason} for director_id, title_id, status, reason in entries ]
+
+        with self._lock:
+            for entry in entries:
+                self.status[ (entry['director_id'], entry['title_id']) ] = entry
+            try:
+                if( self._file is None ):
+                    self._file = open(self.path, 'a')
+
+                self._file.write( ''.join(json.dumps(entry, ensure_ascii=False) + '\n' for entry in entries) )
+                self._file.flush()
+                os.fsync( self._file.fileno() )
+            except:
+                genericErrorInfo(f'\n\terror: journal path: {self.path}')
+
+    def record_pending(self, director_id, title_ids):
+        self.record_entries([ (director_id, title_id, 'pending', '') for title_id in title_ids if self.get_status(director_id, title_id) != 'pending' ])
+
+    def close(self):
+
+        if( self._file is not None ):
+            self._file.close()
+            self._file = None
+
+    def get_status(self, director_id, title_id=''):
+        return self.status.get( (director_id, title_id), {} ).get('status', '')
+
+    def is_director_done(self, director_id):
+        return self.get_status(director_id) == 'done'
+
+    def get_counts(self, director_id):
+
+        counts = {'pending': 0, 'done': 0, 'failed': 0}
+        for (dir_id, title_id), entry in self.status.items():
+            if( dir_id == director_id and title_id != '' ):
+                counts[ entry['status'] ] += 1
+
+        return counts
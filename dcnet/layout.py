@@ -0,0 +1,250 @@
+'''
+layout.py
+Vectorized NumPy force-directed layout of the director-crew graph (vis task), positions are written into the GEXF viz data so Gephi can skip layout
+
+* Coarsening: degree-1 crew (most of the graph) are folded into their director, laid out only after the coarse graph converges
+* Forces (ForceAtlas2-style) on the coarse graph, each iteration O(nodes + edges + grid log grid):
+    * attraction along edges, proportional to distance and edge weight
+    * repulsion between all nodes, proportional to the product of node masses over distance. Approximated (like Barnes-Hut, but with a grid instead of a quadtree) by depositing mass on a grid and convolving with the 1/distance force kernel by FFT
+    * gravity toward the center, keeps disconnected components close
+* Node mass: (1 + degree) scaled by sqrt(cust_size), so directors with high cust_size push their neighborhoods apart
+'''
+import logging
+import math
+import networkx as nx
+import numpy as np
+import os
+
+from dcnet.snapshot import get_graph_snapshot_path
+from dcnet.snapshot import load_graph_snapshot
+from dcnet.snapshot import read_gexf_tolerant
+
+logger = logging.getLogger('dcnet.dcnet')
+
+GOLDEN_ANGLE = math.pi * (3 - math.sqrt(5))
+
+def get_layout_arrays_from_graph(director_crew_graph):
+
+    '''
+        Returns (node_ids, edge_src, edge_dst, edge_weight, node_size) of a networkx graph, the inputs of force_directed_layout()
+    '''
+    node_ids = list(director_crew_graph.nodes)
+    node_index = { node_ids[i]: i for i in range(len(node_ids)) }
+    edges = list( director_crew_graph.edges(data=True) )
+
+    edge_src = np.array( [node_index[u] for u, v, dets in edges], dtype=np.int64 )
+    edge_dst = np.array( [node_index[v] for u, v, dets in edges], dtype=np.int64 )
+    edge_weight = np.array( [dets.get('weight', np.nan) for u, v, dets in edges], dtype=np.float64 )
+    node_size = np.array( [dets.get('cust_size', 1) for n, dets in director_crew_graph.nodes(data=True)], dtype=np.float64 )
+
+    return node_ids, edge_src, edge_dst, edge_weight, node_size
+
+def get_layout_arrays_from_snapshot(snapshot):
+
+    n = snapshot.number_of_nodes()
+    m = snapshot.number_of_edges()
+    edge_weight = np.asarray(snapshot.edge_attrs['weight'], dtype=np.float64) if snapshot.meta['edge_attrs'].get('weight') in ['int', 'float'] else np.full(m, np.nan)
+    node_size = np.asarray(snapshot.node_attrs['cust_size'], dtype=np.float64) if snapshot.meta['node_attrs'].get('cust_size') in ['int', 'float'] else np.ones(n)
+
+    return snapshot.node_ids.tolist(), np.asarray(snapshot.edge_src), np.asarray(snapshot.edge_dst), edge_weight, node_size
+
+def get_repulsion_kernel_fft(grid_size):
+
+    '''
+        FFT of the 1/distance force kernel (x, y components) in grid units on the zero-padded (2 * grid_size)^2 grid, for non-periodic convolution
+    '''
+    offsets = np.fft.fftfreq(2 * grid_size, d=1.0/(2 * grid_size))
+    dx, dy = np.meshgrid(offsets, offsets, indexing='ij')
+    #+1: softening, a cell does not repel itself to infinity
+    dist_sq = dx * dx + dy * dy + 1
+    return np.fft.rfft2(dx/dist_sq), np.fft.rfft2(dy/dist_sq)
+
+def calc_repulsion(pos, mass, grid_size, kernel_fft):
+
+    '''
+        Approximate repulsion sum_j mass_i * mass_j * (pos_i - pos_j)/|pos_i - pos_j|^2 for all i, with cloud-in-cell mass deposit and interpolation
+    '''
+    low = pos.min(axis=0)
+    extent = max( float((pos.max(axis=0) - low).max()), 1e-9 )
+    #cell size, -2: room for the cloud-in-cell neighbor
+    cell = extent/(grid_size - 2)
+
+    grid_pos = (pos - low)/cell
+    base = np.floor(grid_pos).astype(np.int64)
+    frac = grid_pos - base
+
+    density = np.zeros( 2 * grid_size * 2 * grid_size )
+    corners = []
+    for ox in [0, 1]:
+        for oy in [0, 1]:
+            w = (frac[:, 0] if ox else 1 - frac[:, 0]) * (frac[:, 1] if oy else 1 - frac[:, 1])
+            flat = (base[:, 0] + ox) * (2 * grid_size) + (base[:, 1] + oy)
+            density += np.bincount( flat, weights=w * mass, minlength=density.size )
+            corners.append( (flat, w) )
+
+    density_fft = np.fft.rfft2( density.reshape(2 * grid_size, 2 * grid_size) )
+    field = np.empty( (2, density.size) )
+    for axis in [0, 1]:
+        field[axis] = np.fft.irfft2( density_fft * kernel_fft[axis], s=(2 * grid_size, 2 * grid_size) ).ravel()
+
+    force = np.zeros_like(pos)
+    for flat, w in corners:
+        force += field[:, flat].T * w[:, None]
+
+    #kernel is in grid units: 1/distance scales by 1/cell
+    return force * (mass/cell)[:, None]
+
+def force_directed_layout(n, edge_src, edge_dst, edge_weight, node_size, iterations=300, scaling=2.0, gravity=1.0, grid_size=None, seed=0):
+
+    '''
+        n: number of nodes; edge_src, edge_dst: node indices; edge_weight: NaN where missing (uses 1); node_size: cust_size.
+        Returns (n, 2) positions
+    '''
+    rng = np.random.default_rng(seed)
+    pos = np.zeros( (n, 2) )
+    if( n == 0 ):
+        return pos
+
+    not_loop = edge_src != edge_dst
+    edge_src = edge_src[not_loop]
+    edge_dst = edge_dst[not_loop]
+    #mean weight 1, so scaling and gravity are comparable across graphs
+    edge_weight = np.nan_to_num( edge_weight[not_loop], nan=1.0 )
+    edge_weight = edge_weight/edge_weight.mean() if len(edge_weight) != 0 and edge_weight.mean() > 0 else np.ones( len(edge_src) )
+
+    degree = np.bincount( edge_src, minlength=n ) + np.bincount( edge_dst, minlength=n )
+    node_size = np.where( np.isnan(node_size) | (node_size <= 0), 1, node_size )
+    mass = (1.0 + degree) * np.sqrt( node_size/node_size.min() )
+
+    #coarsen: a leaf is a degree-1 node whose neighbor is not a leaf
+    neighbor = np.full( n, -1, dtype=np.int64 )
+    neighbor[edge_src] = edge_dst
+    neighbor[edge_dst] = edge_src
+    is_leaf = (degree == 1) & (degree[np.maximum(neighbor, 0)] > 1)
+
+    coarse = np.flatnonzero(~is_leaf)
+    coarse_index = np.full( n, -1, dtype=np.int64 )
+    coarse_index[coarse] = np.arange( len(coarse) )
+    coarse_edges = ~is_leaf[edge_src] & ~is_leaf[edge_dst]
+    src = coarse_index[ edge_src[coarse_edges] ]
+    dst = coarse_index[ edge_dst[coarse_edges] ]
+    weight = edge_weight[coarse_edges]
+    coarse_mass = mass[coarse]
+    nc = len(coarse)
+
+    if( grid_size is None ):
+        grid_size = int( min(512, max(64, 2 ** math.ceil(math.log2(math.sqrt(nc) + 1)))) )
+    kernel_fft = get_repulsion_kernel_fft(grid_size)
+
+    logger.info( '\tforce_directed_layout(): {:,} nodes ({:,} after folding {:,} leaves), {:,} edges, grid {}, {} iterations'.format(n, nc, n - nc, len(src), grid_size, iterations) )
+
+    cpos = rng.uniform( -1, 1, size=(nc, 2) ) * math.sqrt(nc) * 10
+    for it in range(iterations):
+
+        force = scaling * calc_repulsion(cpos, coarse_mass, grid_size, kernel_fft)
+
+        delta = cpos[src] - cpos[dst]
+        attraction = delta * weight[:, None]
+        for axis in [0, 1]:
+            force[:, axis] -= np.bincount( src, weights=attraction[:, axis], minlength=nc )
+            force[:, axis] += np.bincount( dst, weights=attraction[:, axis], minlength=nc )
+
+        center = cpos - cpos.mean(axis=0)
+        center_dist = np.maximum( np.linalg.norm(center, axis=1), 1e-9 )
+        force -= gravity * (coarse_mass/center_dist)[:, None] * center
+
+        #displacement: force per mass, capped by a temperature that cools relative to the layout extent
+        extent = float( (cpos.max(axis=0) - cpos.min(axis=0)).max() ) if nc > 1 else 1.0
+        temperature = extent * ( 0.05 * (1 - it/iterations) + 0.002 )
+        disp = force/coarse_mass[:, None]
+        disp_len = np.maximum( np.linalg.norm(disp, axis=1), 1e-12 )
+        cpos += disp * ( np.minimum(disp_len, temperature)/disp_len )[:, None]
+
+        if( (it + 1) % 50 == 0 ):
+            logger.info( '\t\titeration {} of {}, extent: {:.1f}'.format(it+1, iterations, extent) )
+
+    pos[coarse] = cpos
+    place_leaves(pos, is_leaf, neighbor, edge_src, edge_dst, edge_weight, cpos, src, dst)
+
+    return pos
+
+def place_leaves(pos, is_leaf, neighbor, edge_src, edge_dst, edge_weight, cpos, src, dst):
+
+    '''
+        Place each leaf on a sunflower spiral around its neighbor, heavier edges nearer
+    '''
+    leaves = np.flatnonzero(is_leaf)
+    if( len(leaves) == 0 ):
+        return
+
+    #spacing: a fraction of the median coarse edge length
+    if( len(src) != 0 ):
+        spacing = 0.15 * float( np.median(np.linalg.norm(cpos[src] - cpos[dst], axis=1)) )
+    else:
+        spacing = 1.0
+    spacing = spacing if spacing > 0 else 1.0
+
+    leaf_weight = np.zeros( len(pos) )
+    leaf_edges = is_leaf[edge_src] | is_leaf[edge_dst]
+    leaf_weight[ np.where(is_leaf[edge_src[leaf_edges]], edge_src[leaf_edges], edge_dst[leaf_edges]) ] = edge_weight[leaf_edges]
+
+    parents = neighbor[leaves]
+    #rank of each leaf among its parent's leaves, by descending weight
+    order = np.lexsort( (-leaf_weight[leaves], parents) )
+    sorted_parents = parents[order]
+    group_start = np.flatnonzero( np.r_[True, sorted_parents[1:] != sorted_parents[:-1]] )
+    group_sizes = np.diff( np.r_[group_start, len(order)] )
+    rank = np.arange( len(order) ) - np.repeat(group_start, group_sizes)
+
+    radius = spacing * np.sqrt(rank + 1)
+    angle = rank * GOLDEN_ANGLE
+    placed = leaves[order]
+    pos[placed, 0] = pos[sorted_parents, 0] + radius * np.cos(angle)
+    pos[placed, 1] = pos[sorted_parents, 1] + radius * np.sin(angle)
+
+def gen_movie_crew_vis(repo='', **kwargs):
+
+    '''
+        Lay out the graph written by net (--graph-snapshot, else --graph-file, else director_crew_graph.snapshot/ or director_crew_graph.gexf) and write it with viz positions to --vis-output
+    '''
+    logger.info('\ngen_movie_crew_vis():')
+
+    graph_snapshot = kwargs.get('graph_snapshot', '')
+    graph_file = kwargs.get('graph_file', '')
+    if( graph_snapshot == '' and graph_file == '' ):
+        graph_file = 'director_crew_graph.gexf'
+        if( os.path.exists(get_graph_snapshot_path(graph_file)) ):
+            graph_snapshot = get_graph_snapshot_path(graph_file)
+
+    if( graph_snapshot != '' ):
+        logger.info(f'\tloading graph snapshot: {graph_snapshot}')
+        snapshot = load_graph_snapshot(graph_snapshot)
+        node_ids, edge_src, edge_dst, edge_weight, node_size = get_layout_arrays_from_snapshot(snapshot)
+        director_crew_graph = snapshot.to_networkx()
+    else:
+        logger.info(f'\tloading graph: {graph_file}')
+        director_crew_graph = read_gexf_tolerant(graph_file)
+        node_ids, edge_src, edge_dst, edge_weight, node_size = get_layout_arrays_from_graph(director_crew_graph)
+
+    pos = force_directed_layout(
+        len(node_ids),
+        edge_src,
+        edge_dst,
+        edge_weight,
+        node_size,
+        iterations=kwargs.get('iterations', 300),
+        scaling=kwargs.get('scaling', 2.0),
+        gravity=kwargs.get('gravity', 1.0),
+        seed=kwargs.get('seed', 0)
+    )
+
+    for i in range(len(node_ids)):
+        director_crew_graph.nodes[ node_ids[i] ]['viz'] = {'position': {'x': float(pos[i, 0]), 'y': float(pos[i, 1]), 'z': 0.0}}
+
+    vis_output = kwargs.get('vis_output', '')
+    vis_output = 'director_crew_graph_layout.gexf' if vis_output == '' else vis_output
+    logger.info(f'\twriting {vis_output}')
+    nx.write_gexf(director_crew_graph, vis_output)
+    logger.info('\tdone writing')
+
+    return pos
@@ -0,0 +1,96 @@
+'''
+negative_cache.py
+Cache of failed/empty IMDb fetches ({repo}negative_cache.json), so data runs do not refetch known-bad titles (and director credits) until a per-reason retry-after has passed
+
+Entries: {imdb_id: {"director_id": ..., "reason": ..., "ts": ..., "attempts": ...}}
+Reasons (see imdb_scraper.get_imdb_page()):
+* dead_title: HTTP 404/410
+* no_fullcredits_content: page without a crew section
+* no_director_credits: director page without a directing section
+* parse_error: page could not be parsed
+* fetch_error: network or server error
+'''
+import logging
+import os
+import time
+
+from dcnet.util import dumpJsonToFile
+from dcnet.util import getDictFromFile
+
+logger = logging.getLogger('dcnet.dcnet')
+
+NEGATIVE_CACHE_FILENAME = 'negative_cache.json'
+
+#retry-after in hours per reason, transient failures are retried sooner
+NEGATIVE_CACHE_RETRY_AFTER = {
+    'dead_title': 30 * 24,
+    'no_fullcredits_content': 7 * 24,
+    'no_director_credits': 7 * 24,
+    'parse_error': 24,
+    'fetch_error': 1
+}
+
+def parse_retry_after(retry_after):
+
+    '''
+        retry_after: list of "reason=hours", e.g., ["dead_title=2160", "fetch_error=0.5"]
+        Returns NEGATIVE_CACHE_RETRY_AFTER updated with retry_after
+    '''
+    policy = dict(NEGATIVE_CACHE_RETRY_AFTER)
+    for r in retry_after:
+        try:
+            reason, hours = r.split('=')
+            policy[reason.strip()] = float(hours)
+        except ValueError:
+            raise ValueError(f'retry-after must be of form reason=hours, e.g., dead_title=720, not: "{r}"')
+
+    return policy
+
+class NegativeCache(object):
+
+    def __init__(self, repo, retry_after=None):
+
+        self.path = f'{repo}{NEGATIVE_CACHE_FILENAME}'
+        self.retry_after = NEGATIVE_CACHE_RETRY_AFTER if retry_after is None else retry_after
+        self.entries = getDictFromFile(self.path)
+        self.changed = False
+
+    def get_retry_after_seconds(self, reason):
+        return self.retry_after.get( reason, self.retry_after['fetch_error'] ) * 3600
+
+    def get_active(self, imdb_id, now=None):
+
+        '''
+            Returns the entry of imdb_id if its retry-after has not passed, else {}
+        '''
+        entry = self.entries.get(imdb_id, {})
+        if( len(entry) == 0 ):
+            return {}
+
+        now = time.time() if now is None else now
+        if( now - entry['ts'] >= self.get_retry_after_seconds(entry['reason']) ):
+            return {}
+
+        return entry
+
+    def record(self, imdb_id, reason, director_id=''):
+
+        attempts = self.entries.get(imdb_id, {}).get('attempts', 0) + 1
+        self.entries[imdb_id] = {'director_id': director_id, 'reason': reason, 'ts': time.time(), 'attempts': attempts}
+        self.changed = True
+
+    def remove(self, imdb_id):
+
+        if( imdb_id in self.entries ):
+            del self.entries[imdb_id]
+            self.changed = True
+
+    def save(self):
+
+        if( self.changed is False ):
+            return
+
+        tmp_path = f'{self.path}.tmp'
+        if( dumpJsonToFile(tmp_path, self.entries, indentFlag=False, extraParams={'verbose': False}) is True ):
+            os.replace(tmp_path, self.path)
+            self.changed = False
@@ -0,0 +1,89 @@
+'''
+result_cache.py
+Size-bounded on-disk cache of per-director results (net --result-cache)
+
+Entries are keyed by a hash of everything the result depends on: the kind of result, director, the director's movie file manifest, and the filter parameters (exclude_movie_types, exclude_movie_roles, self_loops). Changing files or filters therefore never returns a stale entry, and unchanged directors are reused across overlapping configurations.
+'''
+import hashlib
+import json
+import logging
+import os
+
+from glob import glob
+
+from dcnet.store import get_director_loose_movie_paths
+from dcnet.store import PACK_FILENAME
+from dcnet.util import getDictFromJsonGZ
+from dcnet.util import gzipTextFile
+from dcnet.util import jsonDumpsBytes
+
+logger = logging.getLogger('dcnet.dcnet')
+
+#increment when the format or semantics of cached results change
+RESULT_CACHE_VERSION = 1
+RESULT_CACHE_DIRNAME = '.dcnet_cache/results/'
+
+def get_director_manifest(repo, dir_id):
+
+    '''
+        Hash of the (name, size, mtime) of a director's movie files, computed from stat() calls only
+    '''
+    manifest = hashlib.sha256()
+    for path in get_director_loose_movie_paths(repo, dir_id) + glob(f'{repo}{dir_id}/{PACK_FILENAME}'):
+        st = os.stat(path)
+        manifest.update( f'{os.path.basename(path)}\t{st.st_size}\t{st.st_mtime_ns}\n'.encode('utf-8') )
+
+    return manifest.hexdigest()
+
+class ResultCache(object):
+
+    def __init__(self, cache_dir, max_size_mb=512):
+
+        self.cache_dir = cache_dir if cache_dir.endswith('/') else f'{cache_dir}/'
+        self.max_size_bytes = max_size_mb * 1024 * 1024
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def get_key(self, *parts):
+        return hashlib.sha256( json.dumps([RESULT_CACHE_VERSION] + list(parts), sort_keys=True).encode('utf-8') ).hexdigest()
+
+    def get_path(self, key):
+        return f'{self.cache_dir}{key}.json.gz'
+
+    def get(self, key):
+
+        path = self.get_path(key)
+        if( os.path.exists(path) is False ):
+            return {}
+
+        #mtime is the recency used by evict()
+        os.utime(path)
+        return getDictFromJsonGZ(path)
+
+    def put(self, key, value):
+
+        path = self.get_path(key)
+        tmp_path = f'{path}.tmp'
+        gzipTextFile( tmp_path, jsonDumpsBytes(value) )
+        os.replace(tmp_path, path)
+
+    def evict(self):
+
+        '''
+            Remove least recently used entries until the cache is within max_size_bytes
+        '''
+        entries = []
+        for path in glob(f'{self.cache_dir}*.json.gz'):
+            st = os.stat(path)
+            entries.append( (st.st_mtime, st.st_size, path) )
+
+        total_size = sum( e[1] for e in entries )
+        evicted = 0
+        for mtime, size, path in sorted(entries):
+            if( total_size <= self.max_size_bytes ):
+                break
+            os.remove(path)
+            total_size -= size
+            evicted += 1
+
+        if( evicted != 0 ):
+            logger.info(f'\tResultCache: evicted {evicted} entries from {self.cache_dir}')
@@ -0,0 +1,210 @@
+'''
+server.py
+Long-running HTTP/JSON query server over a resident director-crew graph (serve task)
+
+The graph is built (or loaded) once, then queries are answered from memory with an LRU cache of responses:
+* GET /stats
+* GET /neighbors?id=nm0027572&sort=weight&limit=10 (sort: weight, cofeat_rate)
+* GET /edge?u=nm0027572&v=nm0005683
+* GET /director?id=nm0027572&limit=10 (limit: top crew per role in employee_dist)
+* GET /crew?id=nm0005683
+'''
+import json
+import logging
+
+from collections import Counter
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+from urllib.parse import parse_qs
+from urllib.parse import urlparse
+
+from dcnet.backbone import build_movie_crew_graph
+from dcnet.snapshot import load_graph_snapshot
+from dcnet.snapshot import read_gexf_tolerant
+
+logger = logging.getLogger('dcnet.dcnet')
+
+class QueryError(Exception):
+
+    def __init__(self, status, msg):
+        super().__init__(msg)
+        self.status = status
+
+def get_query_param(params, name, default=None):
+
+    val = params.get(name, default)
+    if( val is None ):
+        raise QueryError(400, f'missing query parameter: {name}')
+
+    return val
+
+def get_int_query_param(params, name, default):
+
+    try:
+        return int( params.get(name, default) )
+    except ValueError:
+        raise QueryError(400, f'query parameter {name} must be an integer')
+
+def get_graph_node(director_crew_graph, node_id):
+
+    if( node_id not in director_crew_graph ):
+        raise QueryError(404, f'node not in graph: {node_id}')
+
+    return director_crew_graph.nodes[node_id]
+
+class DCNetQueryServer(ThreadingHTTPServer):
+
+    daemon_threads = True
+
+    def __init__(self, server_address, graph_res, cache_size=1024):
+
+        super().__init__(server_address, DCNetQueryHandler)
+        self.director_crew_graph = graph_res['director_crew_graph']
+        self.director_metadata = graph_res.get('director_metadata', {})
+        self.all_crew_details = graph_res.get('all_crew_details', {})
+        self.roles = graph_res.get('roles', Counter())
+
+        self.routes = {
+            '/stats': self.get_stats,
+            '/neighbors': self.get_neighbors,
+            '/edge': self.get_edge,
+            '/director': self.get_director,
+            '/crew': self.get_crew
+        }
+        self.query = lru_cache(maxsize=cache_size)(self._query)
+
+    def _query(self, path, params):
+
+        '''
+            params: tuple of sorted (name, value) so responses are cacheable.
+            Returns (HTTP status, JSON response bytes)
+        '''
+        if( path not in self.routes ):
+            return 404, json.dumps({'error': f'unknown path: {path}', 'paths': sorted(self.routes)}).encode('utf-8')
+
+        try:
+            res = self.routes[path]( dict(params) )
+            status = 200
+        except QueryError as e:
+            res = {'error': str(e)}
+            status = e.status
+
+        return status, json.dumps(res, ensure_ascii=False, default=str).encode('utf-8')
+
+    def get_stats(self, params):
+
+        #counted from the graph, since director_metadata and all_crew_details are empty for --graph-file/--graph-snapshot. Directors are the nodes not typed 'crew' (labels from the metadata file, or untyped without metadata)
+        node_types = Counter( dets.get('node_type', '') for n, dets in self.director_crew_graph.nodes(data=True) )
+        return {
+            'nodes': self.director_crew_graph.number_of_nodes(),
+            'edges': self.director_crew_graph.number_of_edges(),
+            'directors': self.director_crew_graph.number_of_nodes() - node_types['crew'],
+            'crews': node_types['crew'],
+            'node_types': node_types,
+            'roles': self.roles
+        }
+
+    def get_neighbors(self, params):
+
+        node_id = get_query_param(params, 'id')
+        sort_key = params.get('sort', 'weight')
+        limit = get_int_query_param(params, 'limit', -1)
+        node = get_graph_node(self.director_crew_graph, node_id)
+
+        if( sort_key not in ['weight', 'cofeat_rate'] ):
+            raise QueryError(400, 'sort must be one of: weight, cofeat_rate')
+
+        neighbors = []
+        for neighbor_id, edge_dets in self.director_crew_graph[node_id].items():
+            neighbors.append({ 'id': neighbor_id, 'name': self.director_crew_graph.nodes[neighbor_id].get('name', ''), **edge_dets })
+
+        neighbors = sorted( neighbors, key=lambda x: x.get(sort_key, 0), reverse=True )
+        if( limit > -1 ):
+            neighbors = neighbors[:limit]
+
+        return {'id': node_id, 'name': node.get('name', ''), 'degree': self.director_crew_graph.degree(node_id), 'neighbors': neighbors}
+
+    def get_edge(self, params):
+
+        u = get_query_param(params, 'u')
+        v = get_query_param(params, 'v')
+        if( self.director_crew_graph.has_edge(u, v) is False ):
+            raise QueryError(404, f'edge not in graph: {u}, {v}')
+
+        return {'u': u, 'v': v, **self.director_crew_graph[u][v]}
+
+    def get_director(self, params):
+
+        dir_id = get_query_param(params, 'id')
+        limit = get_int_query_param(params, 'limit', -1)
+        if( dir_id not in self.director_metadata ):
+            #graph loaded from file
+            return {'director_id': dir_id, **get_graph_node(self.director_crew_graph, dir_id)}
+
+        dir_dets = dict(self.director_metadata[dir_id])
+        crew_employee_dist = {}
+        for role, role_dets in dir_dets.get('crew_employee_dist', {}).items():
+
+            employee_dist = sorted( role_dets['employee_dist'].items(), key=lambda x: x[1], reverse=True )
+            if( limit > -1 ):
+                employee_dist = employee_dist[:limit]
+
+            crew_employee_dist[role] = {**role_dets, 'employee_dist': dict(employee_dist)}
+
+        dir_dets['crew_employee_dist'] = crew_employee_dist
+        return dir_dets
+
+    def get_crew(self, params):
+
+        crew_id = get_query_param(params, 'id')
+        if( crew_id not in self.all_crew_details ):
+            return {'id': crew_id, **get_graph_node(self.director_crew_graph, crew_id)}
+
+        return {'id': crew_id, **self.all_crew_details[crew_id]}
+
+class DCNetQueryHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+
+        url = urlparse(self.path)
+        params = tuple(sorted( (k, v[-1]) for k, v in parse_qs(url.query).items() ))
+        status, body = self.server.query(url.path.rstrip('/'), params)
+
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug( 'serve: ' + format % args )
+
+def load_graph_for_serving(repo, exclude_movie_types, **kwargs):
+
+    graph_snapshot = kwargs.get('graph_snapshot', '')
+    if( graph_snapshot != '' ):
+        logger.info(f'\tloading graph snapshot: {graph_snapshot}, director and crew details are limited to node attributes')
+        return {'director_crew_graph': load_graph_snapshot(graph_snapshot).to_networkx()}
+
+    graph_file = kwargs.get('graph_file', '')
+    if( graph_file != '' ):
+        logger.info(f'\tloading graph: {graph_file}, director and crew details are limited to node attributes')
+        return {'director_crew_graph': read_gexf_tolerant(graph_file)}
+
+    return build_movie_crew_graph(repo, exclude_movie_types, **kwargs)
+
+def serve_movie_crew_graph(repo, exclude_movie_types, host='127.0.0.1', port=8000, cache_size=1024, **kwargs):
+
+    logger.info('\nserve_movie_crew_graph():')
+
+    graph_res = load_graph_for_serving(repo, exclude_movie_types, **kwargs)
+    server = DCNetQueryServer( (host, port), graph_res, cache_size=cache_size )
+    logger.info( '\tserving {:,} nodes, {:,} edges on http://{}:{}/'.format(server.director_crew_graph.number_of_nodes(), server.director_crew_graph.number_of_edges(), host, port) )
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        logger.info('\tshutting down')
+    finally:
+        server.server_close()
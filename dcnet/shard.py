@@ -0,0 +1,181 @@
+'''
+shard.py
+Split a scrape across nodes (data --shard k/N) and merge the partial repositories (merge)
+
+Partitioning is a stable hash of the director or title IMDb ID, so every node computes the same partition from the same --director-id list without coordination.
+'''
+import hashlib
+import logging
+import os
+
+from dcnet.store import get_director_title_ids
+from dcnet.store import get_repo_director_ids
+from dcnet.store import iter_director_movie_payloads
+from dcnet.store import PackedSegment
+from dcnet.store import write_repo_movie_payload
+from dcnet.util import dumpJsonToFile
+from dcnet.util import get_mov_imdb_id
+from dcnet.util import getDictFromFile
+from dcnet.util import getDictFromJsonBytes
+
+logger = logging.getLogger('dcnet.dcnet')
+
+def parse_shard(shard):
+
+    '''
+        shard: "k/N", k is 1-based, e.g., "2/4" is the second of four shards
+        Returns (k, N) or None for an empty shard
+    '''
+    if( shard is None or shard.strip() == '' ):
+        return None
+
+    try:
+        k, total = [ int(x) for x in shard.strip().split('/') ]
+    except ValueError:
+        raise ValueError(f'shard must be of form k/N, e.g., 2/4, not: "{shard}"')
+
+    if( total < 1 or k < 1 or k > total ):
+        raise ValueError(f'shard k/N must satisfy 1 <= k <= N, not: "{shard}"')
+
+    return k, total
+
+def get_shard_number(imdb_id, total_shards):
+
+    '''
+        1-based shard of imdb_id. hashlib (unlike hash()) is stable across processes and machines
+    '''
+    digest = hashlib.md5( imdb_id.encode('utf-8') ).digest()
+    return int.from_bytes(digest[:8], 'big') % total_shards + 1
+
+def in_shard(imdb_id, shard):
+
+    if( shard is None ):
+        return True
+
+    return get_shard_number(imdb_id, shard[1]) == shard[0]
+
+def get_movie_crew_count(mov):
+
+    if( len(mov) == 0 ):
+        return -1
+
+    return sum( len(c.get('crew', [])) for c in mov.get('full_credits', []) )
+
+def merge_director_credits(dir_creds):
+
+    merged = {}
+    seen_uris = set()
+    for dir_cred in dir_creds:
+
+        if( len(dir_cred) == 0 ):
+            continue
+
+        if( len(merged) == 0 ):
+            merged = {k: v for k, v in dir_cred.items() if k != 'credits'}
+            merged['credits'] = []
+
+        for k, v in dir_cred.items():
+            if( k != 'credits' and merged.get(k) in [None, '', {}] ):
+                merged[k] = v
+
+        for mov in dir_cred.get('credits', []):
+            if( mov.get('uri', '') not in seen_uris ):
+                seen_uris.add( mov.get('uri', '') )
+                merged['credits'].append(mov)
+
+    return merged
+
+def verify_repo_completeness(repo, max_movies=None):
+
+    '''
+        Check every title listed in each director's credits.json (first max_movies if set) is in the repo.
+        Returns {director_id: [missing title ids]} for directors with missing titles
+    '''
+    missing = {}
+    for dir_id in get_repo_director_ids(repo):
+
+        credits = getDictFromFile(f'{repo}{dir_id}/credits.json').get('credits', [])
+        if( max_movies is not None and max_movies > -1 ):
+            credits = credits[:max_movies]
+
+        present = get_director_title_ids(repo, dir_id)
+        dir_missing = [ get_mov_imdb_id(mov.get('uri', '')) for mov in credits if get_mov_imdb_id(mov.get('uri', '')) not in present ]
+        if( len(dir_missing) != 0 ):
+            missing[dir_id] = dir_missing
+
+    return missing
+
+def merge_partial_repos(partial_repos, repo, max_movies=None, **kwargs):
+
+    '''
+        Combine partial repos (e.g., written by data --shard k/N on different nodes) into repo.
+        * credits.json: union of the credits of each partial, in first-seen order
+        * duplicate titles: the record with the most crew entries is kept, an undecodable record never wins
+        * kwargs['packed_store']: winners are appended to the director's segment, replacing a loose file of the title in repo (see write_repo_movie_payload())
+    '''
+    logger.info('\nmerge_partial_repos():')
+    packed_store = kwargs.get('packed_store', False)
+
+    partial_repos = [ p if p.endswith('/') else f'{p}/' for p in partial_repos ]
+    os.makedirs(repo, exist_ok=True)
+
+    director_ids = set()
+    for p in partial_repos:
+        director_ids |= set( get_repo_director_ids(p) )
+    director_ids = sorted(director_ids)
+
+    total_directors = len(director_ids)
+    total_duplicates = 0
+    for i in range(total_directors):
+
+        dir_id = director_ids[i]
+        dir_cred_filepath = f'{repo}{dir_id}'
+        os.makedirs(f'{dir_cred_filepath}/movies/', exist_ok=True)
+
+        dir_cred = merge_director_credits( [getDictFromFile(f'{p}{dir_id}/credits.json') for p in [repo] + partial_repos] )
+        if( len(dir_cred) != 0 ):
+            dumpJsonToFile(f'{dir_cred_filepath}/credits.json', dir_cred, indentFlag=False, extraParams={'verbose': False})
+
+        #title_id: [crew count (decoded only for duplicates), payload, source repo], the merged repo's own titles compete too
+        best = {}
+        for p in [repo] + partial_repos:
+            for title_id, payload in iter_director_movie_payloads(p, dir_id):
+
+                if( title_id not in best ):
+                    best[title_id] = [None, payload, p]
+                    continue
+
+                total_duplicates += 1
+                if( best[title_id][0] is None ):
+                    best[title_id][0] = get_movie_crew_count( getDictFromJsonBytes(best[title_id][1]) )
+
+                crew_count = get_movie_crew_count( getDictFromJsonBytes(payload) )
+                if( crew_count > best[title_id][0] ):
+                    best[title_id] = [crew_count, payload, p]
+
+        segment = PackedSegment(dir_cred_filepath, writable=True) if packed_store is True else None
+        written = 0
+        for title_id, (crew_count, payload, p) in best.items():
+            if( p == repo ):
+                #already in place
+                continue
+            write_repo_movie_payload(repo, dir_id, title_id, payload, segment=segment)
+            written += 1
+
+        if( segment is not None ):
+            segment.close()
+
+        logger.info(f'\tdirector {i+1} of {total_directors}, {dir_id}: {len(best)} movies, {written} written')
+
+    logger.info(f'\tduplicate titles resolved: {total_duplicates}')
+
+    missing = verify_repo_completeness(repo, max_movies=max_movies)
+    total_missing = sum( len(m) for m in missing.values() )
+    if( total_missing == 0 ):
+        logger.info('\tcomplete: every credited title is present')
+    else:
+        logger.info(f'\tincomplete: {total_missing} credited titles missing across {len(missing)} directors')
+        for dir_id, titles in missing.items():
+            logger.info(f'\t\t{dir_id}: {" ".join(titles)}')
+
+    return missing
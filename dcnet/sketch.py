@@ -0,0 +1,141 @@
+'''
+sketch.py
+Fixed-memory approximate counting for ana --stats --approx
+
+* HyperLogLog: distinct count estimate, relative standard error 1.04/sqrt(2^precision)
+* CountMinSketch: frequency estimate, never below the true count and at most true + eps*N with probability 1 - delta (N: total count added)
+
+Both hash with blake2b, so estimates are reproducible across runs (unlike hash()).
+'''
+import hashlib
+import math
+import numpy as np
+
+def hash64(item):
+    return int.from_bytes( hashlib.blake2b(item.encode('utf-8'), digest_size=8).digest(), 'big' )
+
+class HyperLogLog(object):
+
+    def __init__(self, precision=12):
+
+        if( precision < 4 or precision > 18 ):
+            raise ValueError('HyperLogLog precision must be in [4, 18]')
+
+        self.precision = precision
+        self.m = 1 << precision
+        #bytearray: per-item register updates are much cheaper than numpy scalar indexing
+        self.registers = bytearray(self.m)
+
+        if( self.m >= 128 ):
+            self.alpha = 0.7213/(1 + 1.079/self.m)
+        else:
+            self.alpha = {16: 0.673, 32: 0.697, 64: 0.709}[self.m]
+
+    def add(self, item):
+        self.add_hash( hash64(item) )
+
+    def add_hash(self, h):
+
+        '''
+            h: hash64() of the item, so an item added to several sketches is hashed once
+        '''
+        idx = h >> (64 - self.precision)
+        w = h & ((1 << (64 - self.precision)) - 1)
+        #rank: position of the leftmost 1-bit in the remaining 64 - precision bits
+        rank = (64 - self.precision) - w.bit_length() + 1
+
+        if( rank > self.registers[idx] ):
+            self.registers[idx] = rank
+
+    def add_hashes(self, hashes):
+
+        '''
+            Vectorized add_hash() of a batch of hash64() values
+        '''
+        if( len(hashes) == 0 ):
+            return
+
+        hashes = np.fromiter(hashes, dtype=np.uint64, count=len(hashes))
+        idx = (hashes >> np.uint64(64 - self.precision)).astype(np.intp)
+        w = hashes & np.uint64( (1 << (64 - self.precision)) - 1 )
+
+        #bit_length of w, in two 32-bit halves so the float conversion in frexp() is exact
+        high = (w >> np.uint64(32)).astype(np.float64)
+        low = (w & np.uint64(0xFFFFFFFF)).astype(np.float64)
+        bit_length = np.where( high > 0, np.frexp(high)[1] + 32, np.frexp(low)[1] )
+        rank = ((64 - self.precision) - bit_length + 1).astype(np.uint8)
+
+        np.maximum.at( np.frombuffer(self.registers, dtype=np.uint8), idx, rank )
+
+    def update(self, items):
+        self.add_hashes([ hash64(it) for it in items ])
+
+    def merge(self, other):
+
+        registers = np.frombuffer(self.registers, dtype=np.uint8)
+        np.maximum( registers, np.frombuffer(other.registers, dtype=np.uint8), out=registers )
+
+    def count(self):
+
+        registers = np.frombuffer(self.registers, dtype=np.uint8)
+        estimate = self.alpha * self.m * self.m/np.sum( np.power(2.0, -registers.astype(np.float64)) )
+        zero_registers = int( np.count_nonzero(registers == 0) )
+
+        #small range correction: linear counting
+        if( estimate <= 2.5 * self.m and zero_registers != 0 ):
+            return self.m * math.log(self.m/zero_registers)
+
+        return float(estimate)
+
+    def get_error(self):
+        '''
+            Relative standard error
+        '''
+        return 1.04/math.sqrt(self.m)
+
+class CountMinSketch(object):
+
+    def __init__(self, eps=0.001, delta=0.01):
+
+        self.eps = eps
+        self.delta = delta
+        self.width = int( math.ceil(math.e/eps) )
+        self.depth = int( math.ceil(math.log(1/delta)) )
+        self.counts = np.zeros( (self.depth, self.width), dtype=np.int64 )
+        self.total = 0
+
+    def get_columns(self, item):
+
+        #double hashing: column of row i is h1 + i*h2
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+
+        return [ (h1 + i * h2) % self.width for i in range(self.depth) ]
+
+    def add(self, item, count=1):
+
+        self.counts[ np.arange(self.depth), self.get_columns(item) ] += count
+        self.total += count
+
+    def update(self, item_counts):
+
+        '''
+            Add {item: count} in one batch, e.g., per-item counts buffered over many records
+        '''
+        if( len(item_counts) == 0 ):
+            return
+
+        rows = np.tile( np.arange(self.depth), len(item_counts) )
+        cols = [ col for item in item_counts for col in self.get_columns(item) ]
+        np.add.at( self.counts, (rows, cols), np.repeat(list(item_counts.values()), self.depth) )
+        self.total += sum( item_counts.values() )
+
+    def estimate(self, item):
+        return int( self.counts[ np.arange(self.depth), self.get_columns(item) ].min() )
+
+    def get_error_bound(self):
+        '''
+            Maximum overestimate with probability 1 - delta
+        '''
+        return self.eps * self.total
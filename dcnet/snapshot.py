@@ -0,0 +1,390 @@
+'''
+snapshot.py
+Binary snapshot of the director-crew graph written by net next to the GEXF (e.g., director_crew_graph.snapshot/), memory-mapped back by ana, vis and serve instead of parsing XML
+
+Layout, one .npy file per array so each is loadable with np.load(mmap_mode='r'):
+* node_ids.npy: node IMDb IDs, row i is node i
+* edge_src.npy, edge_dst.npy: node indices of edge j (networkx edge order)
+* indptr.npy, indices.npy, edge_index.npy: CSR adjacency (both directions, self loops once), edge_index maps a CSR entry to its edge j
+* node_attr.{name}.npy, edge_attr.{name}.npy: one column per attribute
+    * int: int64
+    * float: float64 (NaN fill where missing)
+    * category: int32 codes (-1 where missing) into {name}.categories.npy, e.g., role, node_type, name
+* node_attr.{name}.present.npy, edge_attr.{name}.present.npy: bool presence mask of an attribute missing on some rows, so a NaN value (e.g., the bootstrap interval of a director without spread) is kept apart from a missing one
+* meta.json: counts, attribute kinds, masked attributes and the sha256 of the GEXF written with the snapshot
+'''
+import hashlib
+import json
+import logging
+import math
+import networkx as nx
+import numpy as np
+import os
+import shutil
+
+from collections import Counter
+from networkx.readwrite.gexf import GEXFReader
+
+logger = logging.getLogger('dcnet.dcnet')
+
+GRAPH_SNAPSHOT_VERSION = 2
+
+def get_graph_snapshot_path(graph_file):
+
+    '''
+        director_crew_graph.gexf -> director_crew_graph.snapshot/
+    '''
+    root, ext = os.path.splitext(graph_file)
+    return f'{root}.snapshot/'
+
+def get_file_sha256(path):
+
+    file_hash = hashlib.sha256()
+    with open(path, 'rb') as infile:
+        for chunk in iter(lambda: infile.read(1024 * 1024), b''):
+            file_hash.update(chunk)
+
+    return file_hash.hexdigest()
+
+def read_gexf_tolerant(graph_file):
+
+    '''
+        nx.read_gexf() declares an attribute's type from its first value, so cust_size (1 for crew, 1000 * avg_role_homogeneity for directors) is declared integer and reading fails on the first director. Read integer attributes holding floats as float
+    '''
+    def to_number(val):
+        try:
+            return int(val)
+        except ValueError:
+            return float(val)
+
+    reader = GEXFReader()
+    reader.python_type['integer'] = to_number
+    reader.python_type['long'] = to_number
+
+    return reader(graph_file)
+
+def get_attr_kind(values):
+
+    present = [ v for v in values if v is not None ]
+    if( len(present) != 0 and all(isinstance(v, int) and not isinstance(v, bool) for v in present) and len(present) == len(values) ):
+        return 'int'
+
+    if( len(present) != 0 and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in present) ):
+        return 'float'
+
+    return 'category'
+
+def encode_attr_column(values):
+
+    '''
+        values: attribute value per row, None where missing.
+        Returns (kind, column, categories or None, presence mask or None if present on every row)
+    '''
+    kind = get_attr_kind(values)
+    present = np.array( [v is not None for v in values], dtype=bool )
+    present = None if present.all() else present
+
+    if( kind == 'int' ):
+        return kind, np.array(values, dtype=np.int64), None, present
+
+    if( kind == 'float' ):
+        return kind, np.array([ np.nan if v is None else v for v in values ], dtype=np.float64), None, present
+
+    categories = {}
+    codes = np.full( len(values), -1, dtype=np.int32 )
+    for i in range(len(values)):
+        if( values[i] is None ):
+            continue
+        codes[i] = categories.setdefault( str(values[i]), len(categories) )
+
+    return kind, codes, np.array(list(categories.keys()), dtype=str), present
+
+def write_attr_columns(snapshot_path, prefix, rows):
+
+    '''
+        rows: list of attribute dicts (node or edge data). Returns ({name: kind}, names of the attributes with a presence mask)
+    '''
+    names = sorted( set().union(*rows) ) if len(rows) != 0 else []
+    kinds = {}
+    masked = []
+    for name in names:
+        kind, column, categories, present = encode_attr_column( [r.get(name) for r in rows] )
+        np.save( f'{snapshot_path}{prefix}.{name}.npy', column )
+        if( categories is not None ):
+            np.save( f'{snapshot_path}{prefix}.{name}.categories.npy', categories )
+        if( present is not None ):
+            np.save( f'{snapshot_path}{prefix}.{name}.present.npy', present )
+            masked.append(name)
+        kinds[name] = kind
+
+    return kinds, masked
+
+def write_graph_snapshot(director_crew_graph, snapshot_path, graph_file=''):
+
+    '''
+        Write the snapshot of director_crew_graph to snapshot_path (replaced if present). graph_file: the GEXF written from the same graph, its sha256 is recorded for verify_graph_snapshot()
+    '''
+    snapshot_path = snapshot_path if snapshot_path.endswith('/') else f'{snapshot_path}/'
+    tmp_path = snapshot_path.rstrip('/') + '.tmp/'
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    node_ids = list(director_crew_graph.nodes)
+    node_index = { node_ids[i]: i for i in range(len(node_ids)) }
+    edges = list( director_crew_graph.edges(data=True) )
+
+    edge_src = np.array( [node_index[u] for u, v, dets in edges], dtype=np.int64 )
+    edge_dst = np.array( [node_index[v] for u, v, dets in edges], dtype=np.int64 )
+
+    #CSR: each edge in both directions, a self loop once
+    not_loop = edge_src != edge_dst
+    edge_ids = np.arange( len(edges), dtype=np.int64 )
+    rows = np.concatenate( [edge_src, edge_dst[not_loop]] )
+    cols = np.concatenate( [edge_dst, edge_src[not_loop]] )
+    csr_edge_ids = np.concatenate( [edge_ids, edge_ids[not_loop]] )
+    order = np.lexsort( (cols, rows) )
+
+    indptr = np.zeros( len(node_ids) + 1, dtype=np.int64 )
+    np.cumsum( np.bincount(rows, minlength=len(node_ids)), out=indptr[1:] )
+
+    np.save( f'{tmp_path}node_ids.npy', np.array(node_ids, dtype=str) )
+    np.save( f'{tmp_path}edge_src.npy', edge_src )
+    np.save( f'{tmp_path}edge_dst.npy', edge_dst )
+    np.save( f'{tmp_path}indptr.npy', indptr )
+    np.save( f'{tmp_path}indices.npy', cols[order] )
+    np.save( f'{tmp_path}edge_index.npy', csr_edge_ids[order] )
+
+    node_attrs, masked_node_attrs = write_attr_columns( tmp_path, 'node_attr', [dets for n, dets in director_crew_graph.nodes(data=True)] )
+    edge_attrs, masked_edge_attrs = write_attr_columns( tmp_path, 'edge_attr', [dets for u, v, dets in edges] )
+    meta = {
+        'version': GRAPH_SNAPSHOT_VERSION,
+        'nodes': len(node_ids),
+        'edges': len(edges),
+        'node_attrs': node_attrs,
+        'edge_attrs': edge_attrs,
+        'masked_attrs': {'node_attr': masked_node_attrs, 'edge_attr': masked_edge_attrs},
+        'gexf': {}
+    }
+    if( graph_file != '' and os.path.exists(graph_file) ):
+        meta['gexf'] = {'file': os.path.basename(graph_file), 'size': os.path.getsize(graph_file), 'sha256': get_file_sha256(graph_file)}
+
+    with open(f'{tmp_path}meta.json', 'w') as outfile:
+        json.dump(meta, outfile, indent=4)
+
+    shutil.rmtree(snapshot_path, ignore_errors=True)
+    os.replace(tmp_path.rstrip('/'), snapshot_path.rstrip('/'))
+    logger.info( '\twrote graph snapshot: {} ({:,} nodes, {:,} edges)'.format(snapshot_path, meta['nodes'], meta['edges']) )
+
+class GraphSnapshot(object):
+
+    def __init__(self, snapshot_path, mmap_mode='r'):
+
+        self.path = snapshot_path if snapshot_path.endswith('/') else f'{snapshot_path}/'
+        with open(f'{self.path}meta.json') as infile:
+            self.meta = json.load(infile)
+
+        if( self.meta.get('version') != GRAPH_SNAPSHOT_VERSION ):
+            raise ValueError( 'unsupported graph snapshot version {} in {}, rerun net'.format(self.meta.get('version'), self.path) )
+
+        load = lambda name: np.load( f'{self.path}{name}.npy', mmap_mode=mmap_mode )
+        self.node_ids = load('node_ids')
+        self.edge_src = load('edge_src')
+        self.edge_dst = load('edge_dst')
+        self.indptr = load('indptr')
+        self.indices = load('indices')
+        self.edge_index = load('edge_index')
+
+        self.node_attrs = { name: load(f'node_attr.{name}') for name in self.meta['node_attrs'] }
+        self.edge_attrs = { name: load(f'edge_attr.{name}') for name in self.meta['edge_attrs'] }
+        #categories are small, read fully
+        self.categories = {}
+        for prefix, kinds in [('node_attr', self.meta['node_attrs']), ('edge_attr', self.meta['edge_attrs'])]:
+            for name, kind in kinds.items():
+                if( kind == 'category' ):
+                    self.categories[f'{prefix}.{name}'] = np.load( f'{self.path}{prefix}.{name}.categories.npy' ).tolist()
+
+        #presence masks, only for attributes missing on some rows
+        self.present = {}
+        for prefix, names in self.meta['masked_attrs'].items():
+            for name in names:
+                self.present[f'{prefix}.{name}'] = load(f'{prefix}.{name}.present')
+
+        self._node_index = None
+
+    def number_of_nodes(self):
+        return self.meta['nodes']
+
+    def number_of_edges(self):
+        return self.meta['edges']
+
+    def get_node_index(self, node_id):
+
+        if( self._node_index is None ):
+            self._node_index = dict( zip(self.node_ids.tolist(), range(len(self.node_ids))) )
+
+        return self._node_index.get(node_id, -1)
+
+    def degree(self):
+        return np.diff(self.indptr)
+
+    def decode_attr(self, prefix, name, kind, val):
+
+        if( kind == 'int' ):
+            return int(val)
+
+        if( kind == 'float' ):
+            return float(val)
+
+        return self.categories[f'{prefix}.{name}'][val]
+
+    def get_attrs(self, prefix, i):
+
+        kinds = self.meta[f'{prefix}s']
+        columns = self.node_attrs if prefix == 'node_attr' else self.edge_attrs
+
+        attrs = {}
+        for name, kind in kinds.items():
+            present = self.present.get(f'{prefix}.{name}')
+            if( present is not None and bool(present[i]) is False ):
+                continue
+            attrs[name] = self.decode_attr( prefix, name, kind, columns[name][i] )
+
+        return attrs
+
+    def get_node_attrs(self, i):
+        return self.get_attrs('node_attr', i)
+
+    def get_edge_attrs(self, j):
+        return self.get_attrs('edge_attr', j)
+
+    def get_category_counts(self, prefix, name):
+
+        '''
+            Counter of a category attribute's values, computed on the codes
+        '''
+        codes = np.asarray( (self.node_attrs if prefix == 'node_attr' else self.edge_attrs)[name] )
+        counts = np.bincount( codes[codes > -1], minlength=len(self.categories[f'{prefix}.{name}']) )
+        return Counter({ self.categories[f'{prefix}.{name}'][i]: int(counts[i]) for i in range(len(counts)) if counts[i] != 0 })
+
+    def neighbors(self, node_id):
+
+        '''
+            Returns [(neighbor_id, edge attributes)]
+        '''
+        i = self.get_node_index(node_id)
+        if( i == -1 ):
+            return []
+
+        start, end = self.indptr[i], self.indptr[i+1]
+        return [ (self.node_ids[n].item(), self.get_edge_attrs(j)) for n, j in zip(self.indices[start:end], self.edge_index[start:end]) ]
+
+    def to_networkx(self):
+
+        director_crew_graph = nx.Graph()
+        node_ids = self.node_ids.tolist()
+        director_crew_graph.add_nodes_from( (node_ids[i], self.get_node_attrs(i)) for i in range(len(node_ids)) )
+        director_crew_graph.add_edges_from( (node_ids[u], node_ids[v], self.get_edge_attrs(j)) for j, (u, v) in enumerate(zip(self.edge_src.tolist(), self.edge_dst.tolist())) )
+
+        return director_crew_graph
+
+def load_graph_snapshot(snapshot_path, mmap_mode='r'):
+    return GraphSnapshot(snapshot_path, mmap_mode=mmap_mode)
+
+def is_same_attr_value(a, b):
+
+    if( isinstance(a, (int, float)) and isinstance(b, (int, float)) ):
+        if( math.isnan(a) or math.isnan(b) ):
+            return math.isnan(a) and math.isnan(b)
+        return math.isclose(a, b, rel_tol=1e-9, abs_tol=1e-12)
+
+    return str(a) == str(b)
+
+def verify_graph_snapshot(snapshot_path, graph_file, deep=False):
+
+    '''
+        Check the snapshot matches graph_file.
+        * default: graph_file is the GEXF written with the snapshot (size and sha256 in meta.json)
+        * deep: parse graph_file and compare nodes, edges and every attribute (for a GEXF not written with the snapshot, or edited since)
+        Returns a list of mismatch descriptions, empty if the snapshot matches
+    '''
+    snapshot = load_graph_snapshot(snapshot_path)
+    if( deep is False ):
+        recorded = snapshot.meta.get('gexf', {})
+        if( len(recorded) == 0 ):
+            return ['snapshot has no recorded GEXF, use a deep check']
+        if( os.path.getsize(graph_file) != recorded['size'] or get_file_sha256(graph_file) != recorded['sha256'] ):
+            return [ '{} differs from the GEXF the snapshot was written with ({})'.format(graph_file, recorded['file']) ]
+        return []
+
+    mismatches = []
+    gexf_graph = read_gexf_tolerant(graph_file)
+    if( gexf_graph.number_of_nodes() != snapshot.number_of_nodes() or gexf_graph.number_of_edges() != snapshot.number_of_edges() ):
+        mismatches.append( 'GEXF has {:,} nodes, {:,} edges; snapshot has {:,} nodes, {:,} edges'.format(gexf_graph.number_of_nodes(), gexf_graph.number_of_edges(), snapshot.number_of_nodes(), snapshot.number_of_edges()) )
+
+    def cmp_attrs(label, gexf_attrs, snapshot_attrs):
+        #label and id are added by the GEXF writer
+        gexf_attrs = { k: v for k, v in gexf_attrs.items() if k not in ['label', 'id'] }
+        if( gexf_attrs.keys() != snapshot_attrs.keys() ):
+            mismatches.append( f'{label}: attributes {sorted(gexf_attrs)} != {sorted(snapshot_attrs)}' )
+            return
+        for k, v in gexf_attrs.items():
+            if( is_same_attr_value(v, snapshot_attrs[k]) is False ):
+                mismatches.append( f'{label}: {k}: {v} != {snapshot_attrs[k]}' )
+
+    node_ids = snapshot.node_ids.tolist()
+    for i in range(len(node_ids)):
+        if( node_ids[i] not in gexf_graph ):
+            mismatches.append( f'node {node_ids[i]}: not in GEXF' )
+            continue
+        cmp_attrs( f'node {node_ids[i]}', gexf_graph.nodes[node_ids[i]], snapshot.get_node_attrs(i) )
+
+    for j, (u, v) in enumerate(zip(snapshot.edge_src.tolist(), snapshot.edge_dst.tolist())):
+        if( gexf_graph.has_edge(node_ids[u], node_ids[v]) is False ):
+            mismatches.append( f'edge {node_ids[u]}, {node_ids[v]}: not in GEXF' )
+            continue
+        cmp_attrs( f'edge {node_ids[u]}, {node_ids[v]}', gexf_graph[node_ids[u]][node_ids[v]], snapshot.get_edge_attrs(j) )
+
+    return mismatches
+
+def print_graph_snapshot_stats(graph_snapshot, **kwargs):
+
+    '''
+        ana --graph-snapshot: stats of a graph written by net, from the memory-mapped snapshot instead of the repo or GEXF
+    '''
+    snapshot = load_graph_snapshot(graph_snapshot)
+    verify_graph_file = kwargs.get('verify_graph_file', '')
+    if( verify_graph_file != '' ):
+        mismatches = verify_graph_snapshot( graph_snapshot, verify_graph_file, deep=kwargs.get('deep_verify', False) )
+        print( '{}: snapshot {} {}'.format(verify_graph_file, graph_snapshot, 'matches' if len(mismatches) == 0 else 'MISMATCH') )
+        for m in mismatches[:20]:
+            print(f'\t{m}')
+        if( len(mismatches) > 20 ):
+            print( '\t... {:,} more'.format(len(mismatches) - 20) )
+
+    degree = snapshot.degree()
+    print( 'Graph snapshot: {}'.format(graph_snapshot) )
+    print( 'Total nodes: {:,}'.format(snapshot.number_of_nodes()) )
+    print( 'Total edges: {:,}'.format(snapshot.number_of_edges()) )
+    if( len(degree) != 0 ):
+        print( 'Degree: min {:,}, median {:.1f}, mean {:.2f}, max {:,}'.format(int(degree.min()), float(np.median(degree)), float(degree.mean()), int(degree.max())) )
+        print( 'Degree-1 nodes: {:,}'.format(int(np.count_nonzero(degree == 1))) )
+
+    if( snapshot.meta['node_attrs'].get('node_type') == 'category' ):
+        print( '\nNode types:' )
+        for node_type, count in sorted( snapshot.get_category_counts('node_attr', 'node_type').items() ):
+            print( '\t{} {:,}'.format(node_type, count) )
+
+    for name in ['weight', 'cofeat_rate']:
+        if( snapshot.meta['edge_attrs'].get(name) not in ['int', 'float'] ):
+            continue
+        vals = np.asarray(snapshot.edge_attrs[name], dtype=np.float64)
+        vals = vals[~np.isnan(vals)]
+        if( len(vals) != 0 ):
+            quantiles = np.quantile(vals, [0.25, 0.5, 0.75])
+            print( '\nEdge {} ({:,} edges): min {:.4f}, q1 {:.4f}, median {:.4f}, q3 {:.4f}, max {:.4f}'.format(name, len(vals), vals.min(), quantiles[0], quantiles[1], quantiles[2], vals.max()) )
+
+    if( snapshot.meta['edge_attrs'].get('role') == 'category' ):
+        roles = sorted( snapshot.get_category_counts('edge_attr', 'role').items(), key=lambda x: x[0] )
+        print( '\nEdge roles: {}'.format(len(roles)) )
+        for i in range(len(roles)):
+            print( '\t{}. {} {}'.format(i+1, roles[i][0], roles[i][1]) )
@@ -0,0 +1,561 @@
+'''
+store.py
+Director-crew repository storage: loose movie files and packed segments
+
+Repository layout:
+* {repo}{director_id}/credits.json
+* {repo}{director_id}/movies/{title_id}.json.gz (loose, one file per title, gzip) or {title_id}.json.zst (zstd, --codec zstd)
+* {repo}{director_id}/movies.pack (packed, append-only segment of independently compressed records)
+* {repo}{director_id}/movies.pack.idx (sidecar offset index of movies.pack)
+
+Packed record format:
+* header: struct '<HI' (title_id length, payload length), followed by the title_id bytes and the payload
+* payload: compressed (gzip or zstd, see util.compressBytes()) JSON of the movie credits dict, identical to the content of the loose file
+'''
+import json
+import logging
+import mmap
+import os
+import queue
+import struct
+import threading
+
+from glob import glob
+
+from dcnet.util import compressBytes
+from dcnet.util import genericErrorInfo
+from dcnet.util import getBytesFromFile
+from dcnet.util import getDictFromFile
+from dcnet.util import getDictFromJsonBytes
+from dcnet.util import getDictFromJsonGZ
+from dcnet.util import getPayloadCodec
+from dcnet.util import jsonDumpsBytes
+
+logger = logging.getLogger('dcnet.dcnet')
+
+PACK_FILENAME = 'movies.pack'
+PACK_INDEX_FILENAME = 'movies.pack.idx'
+PACK_RECORD_HEADER = struct.Struct('<HI')
+#loose movie file extension per codec, so gzip tools (and .json.gz readers) never see zstd data
+LOOSE_MOVIE_EXTS = {'gzip': '.json.gz', 'zstd': '.json.zst'}
+
+class PackedSegment(object):
+
+    '''
+        Append-only segment of compressed movie records with a sidecar index of title_id -> [payload offset, payload length].
+        Reads are served from a read-only memory map of the segment, so random (get()) and sequential (items()) access avoid per-record open/close.
+        Only a writable segment (one writer per segment, e.g., a data run) repairs the segment: readers (net, ana, serve, ...) open it as is and skip a record still being appended.
+        Appends are made durable in batches: the segment is fsync'd and the index written by flush() and close(), not per record. Records appended after the last flush() are recovered from the segment by the next writable open.
+    '''
+
+    def __init__(self, dir_cred_filepath, writable=False):
+
+        self.pack_path = f'{dir_cred_filepath}/{PACK_FILENAME}'
+        self.index_path = f'{dir_cred_filepath}/{PACK_INDEX_FILENAME}'
+        self.writable = writable
+        self.index = {}
+        self._file = None
+        self._mmap = None
+        self._out = None
+        self._unflushed = 0
+        self._superseded = []
+
+        if( os.path.exists(self.pack_path) is False ):
+            return
+
+        self.index = getDictFromFile(self.index_path)
+        self._sync_index()
+
+    def __contains__(self, title_id):
+        return title_id in self.index
+
+    def __len__(self):
+        return len(self.index)
+
+    def _get_indexed_end(self):
+
+        if( len(self.index) == 0 ):
+            return 0
+
+        return max( off + length for off, length in self.index.values() )
+
+    def _sync_index(self):
+
+        '''
+            Index records appended after the last index write (e.g., a crash between writing a record and its index entry, or a writer that has not flushed yet).
+            A writable segment also truncates a partial trailing record and rewrites the index, a reader ignores the partial record since a writer may still be appending it
+        '''
+        pack_size = os.path.getsize(self.pack_path)
+        offset = self._get_indexed_end()
+        if( offset >= pack_size ):
+            return
+
+        recovered = 0
+        with open(self.pack_path, 'rb') as infile:
+            infile.seek(offset)
+            while( offset + PACK_RECORD_HEADER.size <= pack_size ):
+
+                id_len, payload_len = PACK_RECORD_HEADER.unpack( infile.read(PACK_RECORD_HEADER.size) )
+                payload_off = offset + PACK_RECORD_HEADER.size + id_len
+                if( payload_off + payload_len > pack_size ):
+                    break
+
+                title_id = infile.read(id_len).decode('utf-8')
+                infile.seek(payload_len, os.SEEK_CUR)
+
+                self.index[title_id] = [payload_off, payload_len]
+                offset = payload_off + payload_len
+                recovered += 1
+
+        if( self.writable is False ):
+            return
+
+        if( offset < pack_size ):
+            logger.warning(f'\tPackedSegment: truncating partial record at {offset} in {self.pack_path}')
+            with open(self.pack_path, 'r+b') as outfile:
+                outfile.truncate(offset)
+
+        if( recovered != 0 ):
+            logger.info(f'\tPackedSegment: recovered {recovered} unindexed record(s) in {self.pack_path}')
+            self.write_index()
+
+    def _get_mmap(self):
+
+        if( self._mmap is None and os.path.exists(self.pack_path) ):
+            if( self._out is not None ):
+                #appended records still buffered must be visible to the map
+                self._out.flush()
+            if( os.path.getsize(self.pack_path) != 0 ):
+                self._file = open(self.pack_path, 'rb')
+                self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        return self._mmap
+
+    def _close_mmap(self):
+
+        if( self._mmap is not None ):
+            self._mmap.close()
+            self._mmap = None
+
+        if( self._file is not None ):
+            self._file.close()
+            self._file = None
+
+    def flush(self):
+
+        '''
+            Make the records appended since the last flush() durable, then write the index
+        '''
+        if( self._out is None or self._unflushed == 0 ):
+            return
+
+        self._out.flush()
+        os.fsync( self._out.fileno() )
+        self.write_index()
+        self._unflushed = 0
+
+        for path in self._superseded:
+            if( os.path.exists(path) ):
+                os.remove(path)
+        self._superseded = []
+
+    def remove_after_flush(self, path):
+
+        '''
+            Remove path (e.g., a loose movie file superseded by an appended record) once the records appended so far are durable
+        '''
+        self._superseded.append(path)
+
+    def close(self):
+
+        self.flush()
+        self._close_mmap()
+
+        if( self._out is not None ):
+            self._out.close()
+            self._out = None
+
+    def write_index(self):
+
+        tmp_path = f'{self.index_path}.tmp'
+        try:
+            with open(tmp_path, 'w') as outfile:
+                json.dump(self.index, outfile)
+            os.replace(tmp_path, self.index_path)
+        except:
+            genericErrorInfo(f'\n\terror: index_path: {self.index_path}')
+
+    def get_payload(self, title_id):
+
+        loc = self.index.get(title_id)
+        buf = self._get_mmap()
+        if( loc is None or buf is None ):
+            return b''
+
+        return buf[ loc[0]:loc[0] + loc[1] ]
+
+    def get(self, title_id):
+        return decode_movie_record( self.get_payload(title_id) )
+
+    def items(self):
+
+        '''
+            Sequential read in segment order
+        '''
+        for title_id, loc in sorted( self.index.items(), key=lambda x: x[1][0] ):
+            yield title_id, self.get(title_id)
+
+    def append_payload(self, title_id, payload):
+
+        if( self.writable is False ):
+            raise ValueError(f'PackedSegment: {self.pack_path} not opened for writing')
+
+        title_id_bytes = title_id.encode('utf-8')
+
+        #remap on next read since the segment grows
+        self._close_mmap()
+        if( self._out is None ):
+            self._out = open(self.pack_path, 'ab')
+
+        offset = self._out.tell()
+        self._out.write( PACK_RECORD_HEADER.pack(len(title_id_bytes), len(payload)) )
+        self._out.write( title_id_bytes )
+        self._out.write( payload )
+        self._unflushed += 1
+
+        #a repeated title_id supersedes the earlier record
+        self.index[title_id] = [offset + PACK_RECORD_HEADER.size + len(title_id_bytes), len(payload)]
+
+    def append(self, title_id, mov):
+        self.append_payload( title_id, encode_movie_record(mov) )
+
+
+def encode_movie_record(mov):
+    return compressBytes( jsonDumpsBytes(mov) )
+
+def decode_movie_record(payload):
+    return getDictFromJsonBytes(payload)
+
+def get_loose_movie_path(repo, dir_id, title_id, codec='gzip'):
+    return f'{repo}{dir_id}/movies/{title_id}{LOOSE_MOVIE_EXTS[codec]}'
+
+def find_loose_movie_path(repo, dir_id, title_id):
+
+    '''
+        Returns the path of the loose movie file of title_id in either codec, '' if there is none
+    '''
+    for codec in LOOSE_MOVIE_EXTS:
+        mov_file_path = get_loose_movie_path(repo, dir_id, title_id, codec=codec)
+        if( os.path.exists(mov_file_path) ):
+            return mov_file_path
+
+    return ''
+
+def get_loose_movie_title_id(path):
+
+    filename = os.path.basename(path)
+    for ext in LOOSE_MOVIE_EXTS.values():
+        if( filename.endswith(ext) ):
+            return filename[:-len(ext)]
+
+    return filename
+
+def get_repo_director_ids(repo):
+
+    director_ids = set()
+    for path in glob(f'{repo}*/movies/') + glob(f'{repo}*/{PACK_FILENAME}'):
+        director_ids.add( os.path.basename(os.path.dirname(path.rstrip('/'))) )
+
+    return sorted(director_ids)
+
+def get_director_store_stamp(repo, dir_id):
+
+    '''
+        Cheap change stamp of a director's movie files from two stat() calls: the movies/ directory mtime (loose files are created, replaced or removed, never modified in place) and the packed segment's size and mtime
+    '''
+    stamp = []
+    for path in [f'{repo}{dir_id}/movies', f'{repo}{dir_id}/{PACK_FILENAME}']:
+        try:
+            st = os.stat(path)
+            stamp.append( f'{st.st_size}:{st.st_mtime_ns}' if path.endswith(PACK_FILENAME) else f'{st.st_mtime_ns}' )
+        except FileNotFoundError:
+            stamp.append('')
+
+    return '|'.join(stamp)
+
+def get_director_loose_movie_paths(repo, dir_id):
+    return sorted( path for ext in LOOSE_MOVIE_EXTS.values() for path in glob(f'{repo}{dir_id}/movies/*{ext}') )
+
+def get_director_title_ids(repo, dir_id):
+
+    title_ids = set( get_loose_movie_title_id(path) for path in get_director_loose_movie_paths(repo, dir_id) )
+    seg = PackedSegment(f'{repo}{dir_id}')
+    title_ids |= set(seg.index.keys())
+
+    return title_ids
+
+def iter_director_movies(repo, dir_id, with_title_id=False):
+
+    '''
+        Yield the movies of a director from loose files, then from the packed segment.
+        A title present in both is read from its loose file.
+    '''
+    seen = set()
+    for path in get_director_loose_movie_paths(repo, dir_id):
+        title_id = get_loose_movie_title_id(path)
+        if( title_id in seen ):
+            continue
+        seen.add(title_id)
+        mov = getDictFromJsonGZ(path)
+        yield (title_id, mov) if with_title_id else mov
+
+    seg = PackedSegment(f'{repo}{dir_id}')
+    try:
+        for title_id, mov in seg.items():
+            if( title_id in seen ):
+                continue
+            yield (title_id, mov) if with_title_id else mov
+    finally:
+        seg.close()
+
+def iter_director_movies_by_title(repo, dir_id, title_ids):
+
+    '''
+        Yield the movies of dir_id in title_ids only, each read from its loose file or else the packed segment
+    '''
+    seg = None
+    for title_id in title_ids:
+
+        mov_file_path = find_loose_movie_path(repo, dir_id, title_id)
+        if( mov_file_path != '' ):
+            yield getDictFromJsonGZ(mov_file_path)
+            continue
+
+        if( seg is None ):
+            seg = PackedSegment(f'{repo}{dir_id}')
+        yield seg.get(title_id)
+
+    if( seg is not None ):
+        seg.close()
+
+def iter_repo_movies(repo):
+
+    for dir_id in get_repo_director_ids(repo):
+        yield from iter_director_movies(repo, dir_id)
+
+def iter_director_movie_payloads(repo, dir_id):
+
+    '''
+        Yield (title_id, raw compressed movie record) of a director, loose files first, like iter_director_movies()
+    '''
+    seen = set()
+    for path in get_director_loose_movie_paths(repo, dir_id):
+        title_id = get_loose_movie_title_id(path)
+        if( title_id in seen ):
+            continue
+        seen.add(title_id)
+        yield title_id, getBytesFromFile(path)
+
+    seg = PackedSegment(f'{repo}{dir_id}')
+    for title_id, loc in sorted( seg.index.items(), key=lambda x: x[1][0] ):
+        if( title_id not in seen ):
+            yield title_id, seg.get_payload(title_id)
+    seg.close()
+
+def iter_repo_movie_payloads(repo):
+
+    for dir_id in get_repo_director_ids(repo):
+        for title_id, payload in iter_director_movie_payloads(repo, dir_id):
+            yield payload
+
+def write_repo_movie(repo, dir_id, title_id, mov, segment=None):
+
+    '''
+        Write mov to segment (packed store) if a PackedSegment is given, otherwise to its loose file
+    '''
+    write_repo_movie_payload( repo, dir_id, title_id, encode_movie_record(mov), segment=segment )
+
+def write_repo_movie_payload(repo, dir_id, title_id, payload, segment=None):
+
+    '''
+        Same as write_repo_movie() for an already compressed record. A loose file of title_id is removed once the record written to segment is durable
+    '''
+    if( segment is None ):
+        write_loose_movie_payload(repo, dir_id, title_id, payload)
+        return
+
+    segment.append_payload(title_id, payload)
+    #loose files are read before the segment, so one left in place would shadow the new record
+    for codec in LOOSE_MOVIE_EXTS:
+        mov_file_path = get_loose_movie_path(repo, dir_id, title_id, codec=codec)
+        if( os.path.exists(mov_file_path) ):
+            segment.remove_after_flush(mov_file_path)
+
+def write_loose_movie_payload(repo, dir_id, title_id, payload):
+
+    '''
+        Write a compressed record to the loose file named for its codec (see LOOSE_MOVIE_EXTS), replacing a file of the title in the other codec.
+        Returns True on success
+    '''
+    codec = getPayloadCodec(payload)
+    mov_file_path = get_loose_movie_path(repo, dir_id, title_id, codec=codec)
+    try:
+        #replaced, not overwritten in place, so the movies/ directory mtime changes (see get_director_store_stamp())
+        with open(f'{mov_file_path}.tmp', 'wb') as outfile:
+            outfile.write(payload)
+        os.replace(f'{mov_file_path}.tmp', mov_file_path)
+    except:
+        genericErrorInfo(f'\n\terror: mov_file_path: {mov_file_path}')
+        return False
+
+    for other_codec in LOOSE_MOVIE_EXTS:
+        other_path = get_loose_movie_path(repo, dir_id, title_id, codec=other_codec)
+        if( other_codec != codec and os.path.exists(other_path) ):
+            os.remove(other_path)
+
+    return True
+
+def pack_director_movies(repo, dir_id, remove_loose=False):
+
+    '''
+        Append loose movie files of dir_id to its packed segment. The compressed loose file bytes are copied as-is.
+    '''
+    seg = PackedSegment(f'{repo}{dir_id}', writable=True)
+    paths = get_director_loose_movie_paths(repo, dir_id)
+    packed = 0
+
+    for path in paths:
+
+        title_id = get_loose_movie_title_id(path)
+        try:
+            with open(path, 'rb') as infile:
+                payload = infile.read()
+        except:
+            genericErrorInfo(f'\n\terror: path: {path}')
+            continue
+
+        if( len(payload) == 0 ):
+            continue
+
+        #already packed (e.g., an earlier interrupted pack); a loose file that differs is newer (loose files are read first), so it supersedes the packed record
+        if( title_id in seg and seg.get_payload(title_id) == payload ):
+            packed += 1
+            continue
+
+        seg.append_payload(title_id, payload)
+        packed += 1
+
+    seg.close()
+
+    if( remove_loose is True and packed == len(paths) ):
+        for path in paths:
+            os.remove(path)
+
+    return packed
+
+def unpack_director_movies(repo, dir_id, remove_pack=False):
+
+    seg = PackedSegment(f'{repo}{dir_id}')
+    if( len(seg) == 0 ):
+        return 0
+
+    os.makedirs(f'{repo}{dir_id}/movies/', exist_ok=True)
+    unpacked = 0
+
+    for title_id, loc in seg.index.items():
+
+        if( write_loose_movie_payload(repo, dir_id, title_id, seg.get_payload(title_id)) is True ):
+            unpacked += 1
+
+    seg.close()
+    if( remove_pack is True and unpacked == len(seg) ):
+        os.remove(seg.pack_path)
+        os.remove(seg.index_path)
+
+    return unpacked
+
+def convert_repo_store(repo, unpack=False, remove_source=False, **kwargs):
+
+    logger.info('\nconvert_repo_store():')
+    logger.info(f'\trepo: {repo}, unpack: {unpack}, remove_source: {remove_source}')
+
+    director_ids = get_repo_director_ids(repo)
+    total_directors = len(director_ids)
+    for i in range(total_directors):
+
+        dir_id = director_ids[i]
+        if( unpack is True ):
+            count = unpack_director_movies(repo, dir_id, remove_pack=remove_source)
+        else:
+            count = pack_director_movies(repo, dir_id, remove_loose=remove_source)
+
+        logger.info(f'\tdirector {i+1} of {total_directors}, {dir_id}: {"unpacked" if unpack else "packed"} {count} movies')
+
+class BackgroundMovieWriter(object):
+
+    '''
+        Compress and write movies on a background thread, so the caller (run task) keeps consuming scrape results while they are persisted.
+        Queued calls run in order, e.g., a journal entry queued after a movie is recorded only once the movie is written
+    '''
+    def __init__(self, repo, packed_store=False, max_pending=256):
+
+        self.repo = repo
+        self.packed_store = packed_store
+        self.segments = {}
+        self.written = 0
+        #bounded, so a slow disk applies backpressure instead of buffering every scraped movie
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def _run(self):
+
+        while True:
+            item = self.queue.get()
+            if( item is None ):
+                break
+
+            func, args = item
+            try:
+                func(*args)
+            except:
+                genericErrorInfo(f'\n\terror: BackgroundMovieWriter: {func.__name__}')
+
+    def _write_movie(self, dir_id, title_id, mov_bytes):
+
+        segment = None
+        if( self.packed_store is True ):
+            if( dir_id not in self.segments ):
+                self.segments[dir_id] = PackedSegment(f'{self.repo}{dir_id}', writable=True)
+            segment = self.segments[dir_id]
+
+        write_repo_movie_payload( self.repo, dir_id, title_id, compressBytes(mov_bytes), segment=segment )
+        self.written += 1
+
+    def _close_segment(self, dir_id):
+
+        if( dir_id in self.segments ):
+            self.segments.pop(dir_id).close()
+
+    def put_movie(self, dir_id, title_id, mov):
+        '''
+            mov is serialized before this returns, so the caller may modify it afterwards
+        '''
+        self.queue.put( (self._write_movie, (dir_id, title_id, jsonDumpsBytes(mov))) )
+
+    def put_call(self, func, *args):
+        self.queue.put( (func, args) )
+
+    def put_director_done(self, dir_id):
+        self.put_call(self._close_segment, dir_id)
+
+    def close(self):
+
+        '''
+            Wait for every queued call to finish
+        '''
+        self.queue.put(None)
+        self.thread.join()
+        for segment in self.segments.values():
+            segment.close()
+        self.segments = {}
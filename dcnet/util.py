@@ -1,11 +1,35 @@
 import gzip
+import io
 import os
 import sys
 import json
 import logging
+import time
+
+from multiprocessing import Pool
 
 logger = logging.getLogger('dcnet.dcnet')
 
+#optional codecs, see: setCompressionDefaults()
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import ujson
+except ImportError:
+    ujson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+COMPRESSION_DEFAULTS = {'codec': 'gzip', 'level': 9}
+
 def procLogHandler(handler, loggerDets):
     
     if( handler is None ):
@@ -92,6 +116,32 @@ def genericErrorInfo(slug=''):
     return errMsg
 
 
+def parallelProxy(job):
+
+    try:
+        output = job['func'](**job['args'])
+        error = ''
+    except:
+        output = {}
+        error = genericErrorInfo()
+
+    if( len(job.get('print', '')) != 0 ):
+        logger.info( job['print'] )
+
+    return {'input': job, 'output': output, 'misc': job['misc'], 'error': error}
+
+def iterParallelTask(jobsLst, threadCount=5):
+
+    '''
+        Same job/result format as NwalaTextUtils.textutils.parallelTask(), but results are yielded as each job completes (in completion order) instead of all at once, and a job that raises yields an empty output with 'error' set instead of failing the whole batch.
+    '''
+    if( len(jobsLst) == 0 ):
+        return
+
+    threadCount = max(2, threadCount)
+    with Pool(threadCount) as workers:
+        yield from workers.imap_unordered(parallelProxy, jobsLst)
+
 def readTextFromFile(infilename):
 
     text = ''
@@ -123,7 +173,7 @@ def getDictFromFile(filename):
 def getDictFromJson(jsonStr):
 
     try:
-        return json.loads(jsonStr)
+        return jsonLoads(jsonStr)
     except:
         genericErrorInfo()
 
@@ -135,16 +185,16 @@ def dumpJsonToFile(outfilename, dictToWrite, indentFlag=True, extraParams=None):
         extraParams = {}
 
     extraParams.setdefault('verbose', True)
+    extraParams.setdefault('buffering', io.DEFAULT_BUFFER_SIZE)
 
     try:
-        outfile = open(outfilename, 'w')
-        
         if( indentFlag ):
-            json.dump(dictToWrite, outfile, ensure_ascii=False, indent=4)#by default, ensure_ascii=True, and this will cause  all non-ASCII characters in the output are escaped with \uXXXX sequences, and the result is a str instance consisting of ASCII characters only. Since in python 3 all strings are unicode by default, forcing ascii is unecessary
+            with open(outfilename, 'w', buffering=extraParams['buffering']) as outfile:
+                json.dump(dictToWrite, outfile, ensure_ascii=False, indent=4)#by default, ensure_ascii=True, and this will cause  all non-ASCII characters in the output are escaped with \uXXXX sequences, and the result is a str instance consisting of ASCII characters only. Since in python 3 all strings are unicode by default, forcing ascii is unecessary
         else:
-            json.dump(dictToWrite, outfile, ensure_ascii=False)
-
-        outfile.close()
+            #serialize once and write the bytes in a single call
+            with open(outfilename, 'wb', buffering=extraParams['buffering']) as outfile:
+                outfile.write( jsonDumpsBytes(dictToWrite) )
 
         if( extraParams['verbose'] ):
             logger.info('\tdumpJsonToFile(), wrote: ' + outfilename)
@@ -154,6 +204,88 @@ def dumpJsonToFile(outfilename, dictToWrite, indentFlag=True, extraParams=None):
 
     return True
 
+def getJsonLibName():
+
+    if( orjson is not None ):
+        return 'orjson'
+
+    if( ujson is not None ):
+        return 'ujson'
+
+    return 'json'
+
+def jsonLoads(data):
+
+    '''
+        Parse JSON from bytes (or str) with the fastest installed library. Bytes are parsed directly, without decoding to an intermediate str
+    '''
+    if( orjson is not None ):
+        return orjson.loads(data)
+
+    if( ujson is not None ):
+        return ujson.loads(data)
+
+    return json.loads(data)
+
+def jsonDumpsBytes(obj):
+
+    if( orjson is not None ):
+        return orjson.dumps(obj)
+
+    if( ujson is not None ):
+        return ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+    return json.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+def setCompressionDefaults(codec='gzip', level=None):
+
+    '''
+        Set the codec (and level) used for newly written movie files. Reads detect the codec from the payload, so repos may mix codecs.
+    '''
+    if( codec == 'zstd' and zstandard is None ):
+        logger.warning('\tsetCompressionDefaults(): zstandard not installed (pip install zstandard), falling back to gzip')
+        codec = 'gzip'
+
+    if( codec not in ['gzip', 'zstd'] ):
+        logger.warning(f'\tsetCompressionDefaults(): unknown codec "{codec}", falling back to gzip')
+        codec = 'gzip'
+
+    if( level is None ):
+        level = 9 if codec == 'gzip' else 3
+
+    COMPRESSION_DEFAULTS['codec'] = codec
+    COMPRESSION_DEFAULTS['level'] = level
+
+def compressBytes(data, codec=None, level=None):
+
+    codec = COMPRESSION_DEFAULTS['codec'] if codec is None else codec
+    if( level is None ):
+        level = COMPRESSION_DEFAULTS['level'] if codec == COMPRESSION_DEFAULTS['codec'] else None
+
+    if( codec == 'zstd' ):
+        return zstandard.ZstdCompressor(level=3 if level is None else level).compress(data)
+
+    return gzip.compress(data, compresslevel=9 if level is None else level)
+
+def decompressBytes(data):
+
+    if( data[:4] == ZSTD_MAGIC ):
+        if( zstandard is None ):
+            raise ImportError('zstd-compressed data requires zstandard (pip install zstandard)')
+        #frames written by compressBytes() carry their content size, so one-shot decompression applies
+        return zstandard.ZstdDecompressor().decompress(data)
+
+    if( data[:2] == GZIP_MAGIC ):
+        return gzip.decompress(data)
+
+    #uncompressed
+    return data
+
+def getBytesFromFile(path):
+
+    with open(path, 'rb') as infile:
+        return infile.read()
+
 def getTextFromGZ(path):
     
     path = path.strip()
@@ -161,31 +293,112 @@ def getTextFromGZ(path):
         return ''
         
     try:
-        infile = gzip.open(path, 'rb')
-        txt = infile.read().decode('utf-8')
-        infile.close()
-
-        return txt
+        return decompressBytes( getBytesFromFile(path) ).decode('utf-8')
     except:
         genericErrorInfo(f'Error path: "{path}"')
 
     return ''
 
+def getDictFromJsonBytes(data):
+
+    '''
+        data: compressed (gzip or zstd) or plain JSON bytes
+    '''
+    if( len(data) == 0 ):
+        return {}
+
+    try:
+        return jsonLoads( decompressBytes(data) )
+    except:
+        genericErrorInfo()
+
+    return {}
+
 def getDictFromJsonGZ(path):
 
-    json = getTextFromGZ(path)
-    if( len(json) == 0 ):
+    path = path.strip()
+    if( path == '' ):
         return {}
-    return getDictFromJson(json)
 
-def gzipTextFile(path, txt):
-    
     try:
-        with gzip.open(path, 'wb') as f:
-            f.write(txt.encode())
+        data = getBytesFromFile(path)
+    except:
+        genericErrorInfo(f'Error path: "{path}"')
+        return {}
+
+    return getDictFromJsonBytes(data)
+
+def getPayloadCodec(data):
+
+    '''
+        Returns the codec of compressBytes() output: 'zstd' or 'gzip'
+    '''
+    return 'zstd' if data[:4] == ZSTD_MAGIC else 'gzip'
+
+def gzipTextFile(path, txt, level=None):
+
+    '''
+        txt: str or bytes, written gzip-compressed (see store.write_loose_movie_payload() for movie files in the COMPRESSION_DEFAULTS codec)
+    '''
+    try:
+        data = txt.encode('utf-8') if isinstance(txt, str) else txt
+        with open(path, 'wb') as f:
+            f.write( compressBytes(data, codec='gzip', level=level) )
     except:
         genericErrorInfo()
 
+def benchmarkCodecs(payloads, repeat=3):
+
+    '''
+        payloads: list of compressed movie records as stored in the repo.
+        Compare the stdlib path (gzip -> str -> json) against jsonLoads()/jsonDumpsBytes() with each available codec.
+        Returns list of {'name', 'decode_mb_per_sec', 'encode_mb_per_sec', 'ratio'}, throughput measured on uncompressed JSON bytes
+    '''
+    def best_time(func, items):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for it in items:
+                func(it)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return max(best, 1e-9)
+
+    records = [ json.loads(decompressBytes(p).decode('utf-8')) for p in payloads ]
+    raw_size = sum( len(decompressBytes(p)) for p in payloads ) / (1024 * 1024)
+
+    configs = [
+        {'name': 'stdlib json + gzip-9 (baseline)', 'codec': 'gzip', 'level': 9, 'baseline': True},
+        {'name': f'{getJsonLibName()} + gzip-6', 'codec': 'gzip', 'level': 6},
+        {'name': f'{getJsonLibName()} + gzip-1', 'codec': 'gzip', 'level': 1}
+    ]
+
+    if( zstandard is not None ):
+        configs += [
+            {'name': f'{getJsonLibName()} + zstd-3', 'codec': 'zstd', 'level': 3},
+            {'name': f'{getJsonLibName()} + zstd-9', 'codec': 'zstd', 'level': 9}
+        ]
+
+    report = []
+    for conf in configs:
+
+        if( conf.get('baseline', False) ):
+            encode = lambda rec: gzip.compress( json.dumps(rec, ensure_ascii=False).encode(), compresslevel=9 )
+            decode = lambda dat: json.loads( gzip.decompress(dat).decode('utf-8') )
+        else:
+            encode = lambda rec: compressBytes( jsonDumpsBytes(rec), codec=conf['codec'], level=conf['level'] )
+            decode = getDictFromJsonBytes
+
+        encoded = [ encode(rec) for rec in records ]
+        report.append({
+            'name': conf['name'],
+            'decode_mb_per_sec': raw_size/best_time(decode, encoded),
+            'encode_mb_per_sec': raw_size/best_time(encode, records),
+            'ratio': raw_size * 1024 * 1024/max(1, sum(len(e) for e in encoded))
+        })
+
+    return report
+
 def calc_homogeneity(unique_count, total):
 
     if( unique_count == 1 ):
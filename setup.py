@@ -32,6 +32,7 @@ setup(
         'beautifulsoup4',
         'isoduration',
         'NwalaTextUtils',
+        'numpy',
         'pandas',
         'PyMovieDb'
     ],
@@ -0,0 +1,68 @@
+import logging
+import math
+import unittest
+
+import networkx as nx
+
+from dcnet.backbone import print_dir_role_homogeneity_dets
+from dcnet.bootstrap import add_bootstrap_homogeneity
+from dcnet.bootstrap import bootstrap_director_homogeneity
+
+def get_crew_details():
+
+    '''
+        nm1000000 directed one title, nm2000000 directed four titles with a recurring crew
+    '''
+    all_crew_details = {
+        'nm0000001': {'name': 'A', 'roles': {'nm1000000_tt0000001': ['Music by'], 'nm2000000_tt0000011': ['Music by'], 'nm2000000_tt0000012': ['Music by'], 'nm2000000_tt0000013': ['Music by']}},
+        'nm0000002': {'name': 'B', 'roles': {'nm1000000_tt0000001': ['Music by'], 'nm2000000_tt0000014': ['Music by']}},
+        'nm0000003': {'name': 'C', 'roles': {'nm1000000_tt0000001': ['Film Editing by'], 'nm2000000_tt0000011': ['Film Editing by'], 'nm2000000_tt0000012': ['Film Editing by']}},
+        'nm0000004': {'name': 'D', 'roles': {'nm2000000_tt0000013': ['Film Editing by'], 'nm2000000_tt0000014': ['Film Editing by']}}
+    }
+    return all_crew_details
+
+def get_director_metadata():
+
+    director_metadata = {}
+    for dir_id, avg_role_homogeneity in [('nm1000000', 0.167), ('nm2000000', 0.125)]:
+        director_metadata[dir_id] = {
+            'firstname': dir_id, 'lastname': '', 'sex': 'F', 'ethnicity_race': 'W', 'labels': '',
+            'avg_role_homogeneity': avg_role_homogeneity, 'crew_employee_dist': {}
+        }
+    return director_metadata
+
+class TestBootstrap(unittest.TestCase):
+
+    def test_one_title_director_interval_undefined(self):
+
+        entries = [('tt0000001', 'Music by', 'nm0000001'), ('tt0000001', 'Music by', 'nm0000002'), ('tt0000001', 'Film Editing by', 'nm0000003')]
+        boot = bootstrap_director_homogeneity(entries, resamples=200)
+
+        self.assertIsNone( boot['avg_role_homogeneity_ci'] )
+        self.assertTrue( math.isnan(boot['avg_role_homogeneity_se']) )
+        self.assertEqual( boot['role_homogeneity_ci'], {'Film Editing by': None, 'Music by': None} )
+
+    def test_one_title_director_ranks_last(self):
+
+        director_metadata = get_director_metadata()
+        graph = nx.Graph()
+        graph.add_nodes_from(director_metadata)
+        add_bootstrap_homogeneity( get_crew_details(), graph, director_metadata, resamples=200 )
+
+        self.assertIsNone( director_metadata['nm1000000']['avg_role_homogeneity_ci'] )
+        self.assertTrue( math.isnan(graph.nodes['nm1000000']['avg_role_homogeneity_ci_low']) )
+
+        low, high = director_metadata['nm2000000']['avg_role_homogeneity_ci']
+        self.assertLessEqual(low, high)
+        self.assertGreater( director_metadata['nm2000000']['avg_role_homogeneity_se'], 0 )
+
+        with self.assertLogs('dcnet.dcnet', level=logging.INFO) as logs:
+            print_dir_role_homogeneity_dets(director_metadata)
+
+        ranked = [ l for l in logs.output if 'nm1000000' in l or 'nm2000000' in l ]
+        self.assertIn('nm2000000', ranked[0])
+        self.assertIn('nm1000000', ranked[1])
+        self.assertIn('[undefined]', ranked[1])
+
+if __name__ == '__main__':
+    unittest.main()
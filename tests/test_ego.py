@@ -0,0 +1,75 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from dcnet.ego import CREW_INDEX_FILENAME
+from dcnet.ego import get_ego_node_titles
+from dcnet.ego import load_crew_index
+from dcnet.store import write_repo_movie
+
+def get_movie(title_id, dir_id, crew_ids):
+
+    full_credits = [
+        {'role': 'Directed by', 'crew': [{'link': f'https://www.imdb.com/name/{dir_id}/'}]},
+        {'role': 'Music by', 'crew': [{'link': f'https://www.imdb.com/name/{c}/'} for c in crew_ids]}
+    ]
+    return {'title': title_id, 'director_id': dir_id, 'full_credits': full_credits}
+
+class TestCrewIndex(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo = self.tmp_dir.name + '/'
+
+        #nm1000001 -tt1- nm0000001 -tt2- nm1000002 -tt3- nm0000002 -tt4- nm1000003
+        self.write_movie('tt0000001', 'nm1000001', ['nm0000001'])
+        self.write_movie('tt0000002', 'nm1000002', ['nm0000001'])
+        self.write_movie('tt0000003', 'nm1000002', ['nm0000002'])
+        self.write_movie('tt0000004', 'nm1000003', ['nm0000002'])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_movie(self, title_id, dir_id, crew_ids):
+
+        os.makedirs(f'{self.repo}{dir_id}/movies/', exist_ok=True)
+        write_repo_movie( self.repo, dir_id, title_id, get_movie(title_id, dir_id, crew_ids) )
+
+    def rebuild_crew_index(self):
+
+        os.remove(f'{self.repo}{CREW_INDEX_FILENAME}')
+        return load_crew_index(self.repo)
+
+    def test_ego_node_titles(self):
+
+        crew_index = load_crew_index(self.repo)
+
+        ego_nodes, read_titles = get_ego_node_titles(crew_index, ['nm1000001'], 1)
+        self.assertEqual( ego_nodes, {'nm1000001', 'nm0000001'} )
+        self.assertEqual( read_titles, {'nm1000001': {'tt0000001'}, 'nm1000002': {'tt0000002'}} )
+
+        ego_nodes, read_titles = get_ego_node_titles(crew_index, ['nm1000001'], 2)
+        self.assertEqual( ego_nodes, {'nm1000001', 'nm0000001', 'nm1000002'} )
+        self.assertEqual( read_titles, {'nm1000001': {'tt0000001'}, 'nm1000002': {'tt0000002', 'tt0000003'}} )
+
+    def test_incremental_inverted_map(self):
+
+        load_crew_index(self.repo)
+
+        #replace a title's crew, add a title and remove a director
+        self.write_movie('tt0000003', 'nm1000002', ['nm0000003'])
+        self.write_movie('tt0000005', 'nm1000001', ['nm0000002'])
+        shutil.rmtree(f'{self.repo}nm1000003')
+
+        crew_index = load_crew_index(self.repo)
+        self.assertEqual( crew_index['crew_titles'], {
+            'nm0000001': {'nm1000001': ['tt0000001'], 'nm1000002': ['tt0000002']},
+            'nm0000002': {'nm1000001': ['tt0000005']},
+            'nm0000003': {'nm1000002': ['tt0000003']}
+        })
+        self.assertEqual( crew_index, self.rebuild_crew_index() )
+
+if __name__ == '__main__':
+    unittest.main()
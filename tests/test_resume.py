@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+
+from unittest import mock
+
+from dcnet.backbone import write_director_movie_credits
+from dcnet.journal import ScrapeJournal
+from dcnet.negative_cache import NegativeCache
+from dcnet.store import find_loose_movie_path
+from dcnet.util import dumpJsonToFile
+
+DIRECTOR_ID = 'nm1000000'
+TITLE_IDS = ['tt0000001', 'tt0000002']
+
+def get_full_crew_for_movie_stub(title_id, set_imdb_details=False, err_info=None):
+
+    '''
+        Fails the second title with fetch_error while {repo}fail exists. The repo is read from DCNET_TEST_REPO, since jobs run in worker processes
+    '''
+    if( os.path.exists(os.environ['DCNET_TEST_REPO'] + 'fail') and title_id == TITLE_IDS[1] ):
+        err_info['reason'] = 'fetch_error'
+        return {}
+
+    return {'title': title_id, 'full_credits': []}
+
+class TestResume(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo = self.tmp_dir.name + '/'
+        os.environ['DCNET_TEST_REPO'] = self.repo
+
+        os.makedirs(f'{self.repo}{DIRECTOR_ID}')
+        dumpJsonToFile( f'{self.repo}{DIRECTOR_ID}/credits.json', {'director_name': 'A', 'credits': [{'uri': f'https://www.imdb.com/title/{t}/'} for t in TITLE_IDS]}, indentFlag=False, extraParams={'verbose': False} )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    @mock.patch('dcnet.backbone.get_full_crew_for_movie', get_full_crew_for_movie_stub)
+    def test_resume_retries_journaled_failure(self):
+
+        open(self.repo + 'fail', 'w').close()
+        write_director_movie_credits([DIRECTOR_ID], self.repo, -1, cache_read=True)
+
+        self.assertEqual( ScrapeJournal(self.repo).get_status(DIRECTOR_ID, TITLE_IDS[1]), 'failed' )
+        self.assertNotEqual( NegativeCache(self.repo).get_active(TITLE_IDS[1]), {} )
+        self.assertEqual( find_loose_movie_path(self.repo, DIRECTOR_ID, TITLE_IDS[1]), '' )
+
+        #still within the fetch_error retry-after, resume must not skip the journaled failure
+        os.remove(self.repo + 'fail')
+        write_director_movie_credits([DIRECTOR_ID], self.repo, -1, cache_read=False, resume=True)
+
+        journal = ScrapeJournal(self.repo)
+        self.assertEqual( journal.get_status(DIRECTOR_ID, TITLE_IDS[1]), 'done' )
+        self.assertTrue( journal.is_director_done(DIRECTOR_ID) )
+        self.assertEqual( NegativeCache(self.repo).get_active(TITLE_IDS[1]), {} )
+        self.assertNotEqual( find_loose_movie_path(self.repo, DIRECTOR_ID, TITLE_IDS[1]), '' )
+
+    @mock.patch('dcnet.backbone.get_full_crew_for_movie', get_full_crew_for_movie_stub)
+    def test_cache_read_skips_negative_cache(self):
+
+        open(self.repo + 'fail', 'w').close()
+        write_director_movie_credits([DIRECTOR_ID], self.repo, -1, cache_read=True)
+
+        os.remove(self.repo + 'fail')
+        write_director_movie_credits([DIRECTOR_ID], self.repo, -1, cache_read=True)
+
+        self.assertEqual( find_loose_movie_path(self.repo, DIRECTOR_ID, TITLE_IDS[1]), '' )
+        self.assertFalse( ScrapeJournal(self.repo).is_director_done(DIRECTOR_ID) )
+
+if __name__ == '__main__':
+    unittest.main()
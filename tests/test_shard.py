@@ -0,0 +1,62 @@
+import os
+import tempfile
+import unittest
+
+from dcnet.shard import merge_partial_repos
+from dcnet.store import find_loose_movie_path
+from dcnet.store import iter_director_movies
+from dcnet.store import PackedSegment
+from dcnet.store import write_repo_movie
+from dcnet.util import dumpJsonToFile
+
+DIRECTOR_ID = 'nm1000000'
+
+def get_movie(title_id, total_crew):
+    return {'title': title_id, 'full_credits': [{'role': 'Music by', 'crew': [{'id': f'nm{i:07d}'} for i in range(total_crew)]}]}
+
+def write_partial_repo(repo, movies, credit_title_ids):
+
+    os.makedirs(f'{repo}{DIRECTOR_ID}/movies/')
+    dumpJsonToFile( f'{repo}{DIRECTOR_ID}/credits.json', {'director_name': 'A', 'credits': [{'uri': f'https://www.imdb.com/title/{t}/'} for t in credit_title_ids]}, indentFlag=False, extraParams={'verbose': False} )
+    for mov in movies:
+        write_repo_movie( repo, DIRECTOR_ID, mov['title'], mov )
+
+class TestMergePartialRepos(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.tmp = self.tmp_dir.name + '/'
+
+        #tt0000001 is in both partials, the second has the more complete record
+        write_partial_repo( f'{self.tmp}p1/', [get_movie('tt0000001', 1), get_movie('tt0000002', 2)], ['tt0000001', 'tt0000002'] )
+        write_partial_repo( f'{self.tmp}p2/', [get_movie('tt0000001', 3)], ['tt0000001', 'tt0000003'] )
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def get_merged_movies(self, repo):
+        return { mov['title']: len(mov['full_credits'][0]['crew']) for mov in iter_director_movies(repo, DIRECTOR_ID) }
+
+    def test_duplicates_and_completeness(self):
+
+        repo = f'{self.tmp}merged/'
+        missing = merge_partial_repos( [f'{self.tmp}p1', f'{self.tmp}p2'], repo )
+
+        self.assertEqual( self.get_merged_movies(repo), {'tt0000001': 3, 'tt0000002': 2} )
+        self.assertEqual( missing, {DIRECTOR_ID: ['tt0000003']} )
+
+    def test_packed_merge_replaces_stale_loose_file(self):
+
+        #the target already has a loose record of tt0000001 worse than the second partial's
+        repo = f'{self.tmp}merged/'
+        write_partial_repo( repo, [get_movie('tt0000001', 0)], [] )
+
+        merge_partial_repos( [f'{self.tmp}p1', f'{self.tmp}p2'], repo, packed_store=True )
+
+        self.assertEqual( find_loose_movie_path(repo, DIRECTOR_ID, 'tt0000001'), '' )
+        self.assertIn( 'tt0000001', PackedSegment(f'{repo}{DIRECTOR_ID}') )
+        self.assertEqual( self.get_merged_movies(repo), {'tt0000001': 3, 'tt0000002': 2} )
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import math
+import tempfile
+import unittest
+
+import networkx as nx
+
+from dcnet.backbone import write_movie_crew_graph
+from dcnet.snapshot import get_graph_snapshot_path
+from dcnet.snapshot import load_graph_snapshot
+from dcnet.snapshot import verify_graph_snapshot
+
+class TestGraphSnapshot(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.graph_file = self.tmp_dir.name + '/director_crew_graph.gexf'
+
+        #nm1000001 has an undefined bootstrap interval (NaN), crew nodes have none (missing)
+        graph = nx.Graph()
+        graph.add_node('nm1000001', node_type='FW', avg_role_homogeneity=0.5, avg_role_homogeneity_ci_low=float('nan'))
+        graph.add_node('nm1000002', node_type='MW', avg_role_homogeneity=0.25, avg_role_homogeneity_ci_low=0.125)
+        graph.add_node('nm0000001', node_type='crew')
+        graph.add_edge('nm1000001', 'nm0000001', weight=1, role='Music by')
+        graph.add_edge('nm1000002', 'nm0000001', weight=2)
+
+        write_movie_crew_graph(graph, self.graph_file)
+        self.snapshot_path = get_graph_snapshot_path(self.graph_file)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_nan_is_not_missing(self):
+
+        graph = load_graph_snapshot(self.snapshot_path).to_networkx()
+
+        self.assertTrue( math.isnan(graph.nodes['nm1000001']['avg_role_homogeneity_ci_low']) )
+        self.assertEqual( graph.nodes['nm1000002']['avg_role_homogeneity_ci_low'], 0.125 )
+        self.assertNotIn( 'avg_role_homogeneity_ci_low', graph.nodes['nm0000001'] )
+        self.assertNotIn( 'role', graph['nm1000002']['nm0000001'] )
+        self.assertEqual( graph['nm1000001']['nm0000001'], {'weight': 1, 'role': 'Music by'} )
+
+    def test_deep_verify(self):
+        self.assertEqual( verify_graph_snapshot(self.snapshot_path, self.graph_file, deep=True), [] )
+
+if __name__ == '__main__':
+    unittest.main()
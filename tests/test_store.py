@@ -0,0 +1,109 @@
+import json
+import os
+import tempfile
+import unittest
+
+from dcnet.store import encode_movie_record
+from dcnet.store import get_director_loose_movie_paths
+from dcnet.store import get_loose_movie_title_id
+from dcnet.store import pack_director_movies
+from dcnet.store import PackedSegment
+from dcnet.store import unpack_director_movies
+from dcnet.store import write_repo_movie_payload
+
+DIRECTOR_ID = 'nm1000000'
+TITLE_IDS = ['tt0000001', 'tt0000002', 'tt0000003']
+
+def read_loose_payloads(repo):
+
+    payloads = {}
+    for path in get_director_loose_movie_paths(repo, DIRECTOR_ID):
+        with open(path, 'rb') as infile:
+            payloads[ get_loose_movie_title_id(path) ] = infile.read()
+
+    return payloads
+
+class TestPackedSegment(unittest.TestCase):
+
+    def setUp(self):
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo = self.tmp_dir.name + '/'
+        self.dir_path = f'{self.repo}{DIRECTOR_ID}'
+        os.makedirs(f'{self.dir_path}/movies/')
+
+        self.payloads = { t: encode_movie_record({'title': t, 'full_credits': []}) for t in TITLE_IDS }
+        for title_id, payload in self.payloads.items():
+            write_repo_movie_payload(self.repo, DIRECTOR_ID, title_id, payload)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def write_torn_segment(self):
+
+        '''
+            Segment of the three titles, as left by a crash: the index only has the first, the last record is cut off mid-payload
+        '''
+        seg = PackedSegment(self.dir_path, writable=True)
+        seg.append_payload( TITLE_IDS[0], self.payloads[TITLE_IDS[0]] )
+        first_loc = seg.index[TITLE_IDS[0]]
+        for title_id in TITLE_IDS[1:]:
+            seg.append_payload( title_id, self.payloads[title_id] )
+        seg.close()
+
+        with open(seg.index_path, 'w') as outfile:
+            json.dump({TITLE_IDS[0]: first_loc}, outfile)
+
+        torn_size = os.path.getsize(seg.pack_path) - 3
+        with open(seg.pack_path, 'r+b') as outfile:
+            outfile.truncate(torn_size)
+
+        return torn_size
+
+    def test_reader_does_not_repair(self):
+
+        torn_size = self.write_torn_segment()
+        with open(f'{self.dir_path}/movies.pack.idx', 'rb') as infile:
+            index_bytes = infile.read()
+
+        seg = PackedSegment(self.dir_path)
+        self.assertEqual( sorted(seg.index), TITLE_IDS[:2] )
+        self.assertEqual( seg.get_payload(TITLE_IDS[1]), self.payloads[TITLE_IDS[1]] )
+        seg.close()
+
+        self.assertEqual( os.path.getsize(seg.pack_path), torn_size )
+        with open(seg.index_path, 'rb') as infile:
+            self.assertEqual( infile.read(), index_bytes )
+
+    def test_writer_repairs(self):
+
+        torn_size = self.write_torn_segment()
+
+        seg = PackedSegment(self.dir_path, writable=True)
+        self.assertEqual( sorted(seg.index), TITLE_IDS[:2] )
+        self.assertLess( os.path.getsize(seg.pack_path), torn_size )
+
+        #the truncated title can be appended again after the repaired records
+        seg.append_payload( TITLE_IDS[2], self.payloads[TITLE_IDS[2]] )
+        seg.close()
+
+        seg = PackedSegment(self.dir_path)
+        self.assertEqual( {t: seg.get_payload(t) for t in seg.index}, self.payloads )
+        seg.close()
+
+    def test_pack_unpack_round_trip(self):
+
+        self.assertEqual( pack_director_movies(self.repo, DIRECTOR_ID, remove_loose=True), len(TITLE_IDS) )
+        self.assertEqual( read_loose_payloads(self.repo), {} )
+
+        #repacking nothing leaves the segment as is
+        pack_size = os.path.getsize(f'{self.dir_path}/movies.pack')
+        pack_director_movies(self.repo, DIRECTOR_ID)
+        self.assertEqual( os.path.getsize(f'{self.dir_path}/movies.pack'), pack_size )
+
+        self.assertEqual( unpack_director_movies(self.repo, DIRECTOR_ID, remove_pack=True), len(TITLE_IDS) )
+        self.assertEqual( read_loose_payloads(self.repo), self.payloads )
+        self.assertFalse( os.path.exists(f'{self.dir_path}/movies.pack') )
+
+if __name__ == '__main__':
+    unittest.main()